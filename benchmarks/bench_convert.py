@@ -0,0 +1,87 @@
+"""
+Benchmark parsing and rendering a large synthetic document.
+
+Run it once against the pure-Python package and once against the compiled
+build to compare them (see DEVELOPMENT.md):
+
+    python benchmarks/bench_convert.py
+    python benchmarks/bench_convert.py --sections 2000 --repeat 5
+"""
+
+import argparse
+import io
+import time
+
+from texweaver import Converter, TexConfig, TexParser
+from texweaver._compiled import is_compiled
+
+SECTION = """# Chapter {i}
+
+Some *introductory* text with **bold** words, `inline code` and a formula
+$x_{i} = y^2$ that wraps onto a second line, with a reference to
+[the table](#tab-{i}) and more text after it.
+
+## Details {{#sec:details-{i}}}
+
+- first item with *emphasis*
+- second item with `code`
+- third item
+
+1. one
+2. two
+
+```python
+def f(x):
+    return x * {i}
+```
+
+$$
+E_{i} = mc^2
+$$ {{#eq:energy-{i}}}
+
+| Name | Value | Note |
+| :--- | ----: | ---- |
+| a{i} | {i} | plain |
+| b{i} | **{i}** | with *markup* |
+
+![Figure {i}](figure{i}.png)
+
+<!-- a comment --> Closing paragraph for section {i}.
+"""
+
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sections", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--template", default="default")
+    args = parser.parse_args()
+
+    text = "\n".join(SECTION.format(i=i) for i in range(args.sections))
+    converter = Converter(TexConfig(args.template))
+    document = converter.parse(text)
+
+    parse_time = best_of(args.repeat, lambda: TexParser().parse(text))
+    render_time = best_of(
+        args.repeat,
+        lambda: converter.renderer().write_document(document, io.StringIO()),
+    )
+
+    build = "compiled" if is_compiled() else "interpreted"
+    lines = text.count("\n") + 1
+    print(f"{build}: {lines} lines, best of {args.repeat}")
+    print(f"  parse   {parse_time:8.3f}s  {lines / parse_time:12,.0f} lines/s")
+    print(f"  render  {render_time:8.3f}s  {lines / render_time:12,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark the cost of source line tracking and of writing a source map.
+
+Every parsed document records the Markdown line of each component in the
+`Document.source_lines` side table. This compares parsing with it against a
+document that skips it, and rendering with and without a `SourceMap`. The
+map's entries are built from the recorded marks when it is first read, which
+is timed separately. Runs with and without alternate, so that noise from
+other processes affects both:
+
+    python benchmarks/bench_source_map.py
+    python benchmarks/bench_source_map.py --sections 2000 --repeat 30
+"""
+
+import argparse
+import gc
+import io
+import time
+from typing import Any
+
+from bench_convert import SECTION, best_of
+
+from texweaver import Converter, SourceMap, TexConfig, TexParser
+from texweaver import markdown as xwm
+from texweaver._compiled import is_compiled
+
+
+def document_class(track_lines: bool) -> type:
+    """
+    A copy of Document.add_component with or without the side table.
+
+    Both variants are plain Python, so they compare fairly in the compiled
+    build too.
+    """
+
+    class BenchDocument(xwm.Document):
+        def add_component(self, component: Any, line: int = 0) -> None:
+            self.components.append(component)
+            if track_lines:
+                self.source_lines.append(line)
+            kind = type(component)
+            if kind is xwm.Include:
+                self._includes.append(component)
+                self._label_items.append(component)
+                self._outline_items.append((len(self.components) - 1, component))
+            elif kind in xwm._LABELED_TYPES:
+                self.add_label(component)
+                if kind is xwm.Heading:
+                    self._outline_items.append((len(self.components) - 1, component))
+
+    return BenchDocument
+
+
+def parser_class(track_lines: bool) -> type:
+    document = document_class(track_lines)
+
+    class BenchParser(TexParser):
+        def reset(self, *args: Any, **kwargs: Any) -> None:
+            super().reset(*args, **kwargs)
+            self.document = document()
+
+    return BenchParser
+
+
+def best_of_interleaved(repeat, without, with_):
+    """
+    Best times of two functions, run alternately so noise hits both.
+
+    As in timeit, the garbage collector is off while a function runs, so a
+    collection triggered by earlier allocations is not charged to it.
+    """
+    times = ([], [])
+    for _ in range(repeat):
+        for timings, func in zip(times, (without, with_)):
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.process_time()
+                func()
+                timings.append(time.process_time() - start)
+            finally:
+                gc.enable()
+    return min(times[0]), min(times[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sections", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--template", default="default")
+    args = parser.parse_args()
+
+    text = "\n".join(SECTION.format(i=i) for i in range(args.sections))
+    converter = Converter(TexConfig(args.template))
+    document = converter.parse(text)
+
+    untracked_parser, tracked_parser = parser_class(False), parser_class(True)
+    parse_times = best_of_interleaved(
+        args.repeat,
+        lambda: untracked_parser().parse(text),
+        lambda: tracked_parser().parse(text),
+    )
+
+    maps = []
+
+    def render(source_map):
+        renderer = converter.renderer()
+        if source_map:
+            renderer.source_map = SourceMap()
+            maps.append(renderer.source_map)
+        renderer.write_document(document, io.StringIO())
+
+    render_times = best_of_interleaved(
+        args.repeat, lambda: render(False), lambda: render(True)
+    )
+    # Entries are built from the marks when the map is first read
+    finish_time = best_of(args.repeat, lambda: len(maps.pop()))
+
+    build = "compiled" if is_compiled() else "interpreted"
+    lines = text.count("\n") + 1
+    table = document.source_lines
+    print(f"{build}: {lines} lines, best of {args.repeat}")
+    print(
+        f"  side table  {len(table)} entries, "
+        f"{len(table) * table.itemsize / 1024:.0f} KiB"
+    )
+    for name, (base, timed) in (("parse ", parse_times), ("render", render_times)):
+        print(
+            f"  {name}  {base:8.3f}s without  {timed:8.3f}s with  "
+            f"{(timed / base - 1) * 100:+6.1f}%"
+        )
+    print(
+        f"  map entries {finish_time:8.3f}s  "
+        f"{finish_time / render_times[0] * 100:+6.1f}% of a plain render"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,11 @@
+from .assets import *
+from .converter import *
+from .includes import *
+from .limits import *
+from .output import *
+from .render import *
+from .sourcemap import *
+from .streams import *
 from .tex_config import *
 from .tex_parser import *
 
@@ -0,0 +1,22 @@
+"""Support for the optional mypyc-compiled build (see DEVELOPMENT.md)."""
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from mypy_extensions import mypyc_attr
+else:
+
+    def mypyc_attr(*attrs, **kwattrs):
+        # mypyc reads the decorator at compile time; at run time it does
+        # nothing, so mypy_extensions is not needed to import the package
+        return lambda cls: cls
+
+
+def is_compiled() -> bool:
+    """Whether the parser, AST, config and render modules are running compiled."""
+    from . import markdown, render, tex_config, tex_parser
+
+    return not any(
+        m.__file__ is None or m.__file__.endswith(".py")
+        for m in (markdown, render, tex_config, tex_parser)
+    )
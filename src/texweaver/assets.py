@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import markdown as xwm
+from .output import CHUNK_SIZE, write_if_changed
+
+__all__ = [
+    "ASSET_CACHE_NAME",
+    "IMAGE_EXTENSIONS",
+    "Asset",
+    "MissingAsset",
+    "AssetReport",
+    "AssetPipeline",
+]
+
+# Name of the stat/hash cache written into the output directory by the CLI
+ASSET_CACHE_NAME = ".texweaver-assets.json"
+
+# Extensions tried, in graphicx's order, for image paths given without one
+IMAGE_EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg", ".eps")
+
+# Files probed or copied per thread pool task
+_BATCH_SIZE = 64
+
+# (mtime_ns, size, sha256 hex digest) of a file
+_Stamp = Tuple[int, int, str]
+
+
+class Asset:
+    """An image file referenced by a document, identified by its content."""
+
+    def __init__(self, source: str, digest: str, size: int):
+        self.source = source
+        self.digest = digest
+        self.size = size
+        # Every referenced file with this content; `source` is the first
+        self.sources = [source]
+        # Path written into the LaTeX output, or None if paths are not rewritten
+        self.path: Optional[str] = None
+        # (Markdown file, line) of every reference to the asset
+        self.references: List[Tuple[Optional[str], int]] = []
+
+
+class MissingAsset:
+    """An image reference whose file does not exist."""
+
+    def __init__(self, path: str, source_path: Optional[str], line: int):
+        self.path = path
+        self.source_path = source_path
+        self.line = line
+
+    def __str__(self) -> str:
+        where = self.source_path or "<input>"
+        if self.line:
+            where = f"{where}:{self.line}"
+        return f"{where}: image '{self.path}' not found"
+
+
+class AssetReport:
+    """Result of `AssetPipeline.process`."""
+
+    def __init__(self) -> None:
+        # Unique assets by content digest, in order of first reference
+        self.assets: Dict[str, Asset] = {}
+        self.missing: List[MissingAsset] = []
+        # Number of image references and of files copied
+        self.references = 0
+        self.copied = 0
+
+    @property
+    def duplicates(self) -> int:
+        """Number of referenced files whose content is identical to another's."""
+        return sum(len(asset.sources) - 1 for asset in self.assets.values())
+
+
+class AssetPipeline:
+    """
+    Resolve, check, deduplicate and optionally copy the images of a document.
+
+    Image paths are resolved relative to the Markdown file that references
+    them (for included files, the included file). All files are checked
+    concurrently with a thread pool, and files with identical content are
+    merged into one asset, so the PDF embeds each image once.
+
+    When `output_dir` is given, every image node's `resolved_path` is set to a
+    path relative to it, which the renderer uses instead of the path written
+    in the Markdown. With `copy_dir` (relative to `output_dir`), each unique
+    asset is also copied there under a name derived from its content hash,
+    so the output directory can be compiled on its own.
+
+    The size, modification time and content hash of each file are cached, in
+    memory and in `cache_path` if given, so only files that changed on disk
+    are hashed again; a warm run only has to stat every file.
+
+    Example:
+        pipeline = AssetPipeline("build", copy_dir="images")
+        report = pipeline.process(document)
+        for missing in report.missing:
+            print(missing)
+    """
+
+    def __init__(
+        self,
+        output_dir: Optional[str] = None,
+        copy_dir: Optional[str] = None,
+        cache_path: Optional[str] = None,
+        max_workers: Optional[int] = None,
+    ):
+        """
+        Args:
+            output_dir: Directory the LaTeX output is compiled in; image paths
+                are rewritten relative to it
+            copy_dir: Directory, relative to `output_dir`, to copy assets into
+            cache_path: File to load and save the stat/hash cache
+            max_workers: Size of the thread pool (default: chosen by Python)
+        """
+        if copy_dir is not None and output_dir is None:
+            raise ValueError("copy_dir requires output_dir")
+        self.output_dir = output_dir
+        self.copy_dir = copy_dir
+        self.cache_path = cache_path
+        self.max_workers = max_workers
+        self._cache: Dict[str, _Stamp] = self._load_cache()
+        self._lock = threading.Lock()
+        self.hash_count = 0
+
+    def process(
+        self, document: "xwm.Document", base_dir: Optional[str] = None
+    ) -> AssetReport:
+        """
+        Process every image of a document, including included files.
+
+        Args:
+            document: The parsed document; its image nodes are updated
+            base_dir: Directory for images of documents without a source path
+                (defaults to the current directory)
+        """
+        report = AssetReport()
+        # (node, candidate paths, markdown file, line)
+        images: List[Tuple["xwm.Image", Tuple[str, ...], Optional[str], int]] = []
+        for doc, index, node in document.iter_indexed():
+            if not isinstance(node, xwm.Image):
+                continue
+            if doc.source_path is not None:
+                directory = os.path.dirname(os.path.abspath(doc.source_path))
+            else:
+                directory = os.path.abspath(base_dir or os.curdir)
+            line = doc.source_lines[index] if index < len(doc.source_lines) else 0
+            candidates = _candidates(directory, node.path)
+            images.append((node, candidates, doc.source_path, line))
+        report.references = len(images)
+
+        paths = list(dict.fromkeys(p for _, c, _, _ in images for p in c))
+        stamps = dict(zip(paths, self._run(self._probe, paths)))
+
+        canonical: Dict[str, Asset] = {}
+        for node, candidates, source_path, line in images:
+            path = next((p for p in candidates if stamps[p] is not None), None)
+            if path is None:
+                node.resolved_path = None
+                report.missing.append(MissingAsset(node.path, source_path, line))
+                continue
+            _, size, digest = stamps[path]
+            asset = report.assets.get(digest)
+            if asset is None:
+                asset = report.assets[digest] = Asset(path, digest, size)
+            elif path not in canonical:
+                asset.sources.append(path)
+            canonical[path] = asset
+            asset.references.append((source_path, line))
+
+        if self.copy_dir is not None:
+            assets = list(report.assets.values())
+            report.copied = sum(self._run(self._copy, assets))
+        elif self.output_dir is not None:
+            for asset in report.assets.values():
+                asset.path = self._relative(asset.source)
+
+        for node, candidates, _, _ in images:
+            path = next((p for p in candidates if p in canonical), None)
+            if path is not None:
+                node.resolved_path = canonical[path].path
+
+        self._save_cache()
+        return report
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Drop the cached hash for `path`, or the whole cache."""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(os.path.abspath(path), None)
+
+    def _run(self, func: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+        """Apply `func` to items in the thread pool, in batches."""
+        if len(items) <= _BATCH_SIZE:
+            return [func(item) for item in items]
+        batches = [
+            items[i : i + _BATCH_SIZE] for i in range(0, len(items), _BATCH_SIZE)
+        ]
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            results = pool.map(lambda batch: [func(item) for item in batch], batches)
+            return [result for batch in results for result in batch]
+
+    def _probe(self, path: str) -> Optional[_Stamp]:
+        """Stat a file and hash it if it changed; None if it does not exist."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached
+        stamp = (st.st_mtime_ns, st.st_size, _hash_file(path))
+        with self._lock:
+            self._cache[path] = stamp
+            self.hash_count += 1
+        return stamp
+
+    def _copy(self, asset: Asset) -> bool:
+        """Copy an asset into the copy directory unless it is already there."""
+        assert self.output_dir is not None and self.copy_dir is not None
+        name = asset.digest[:16] + os.path.splitext(asset.source)[1]
+        directory = os.path.join(self.output_dir, self.copy_dir)
+        destination = os.path.join(directory, name)
+        asset.path = self._relative(destination)
+        # Names are derived from the content, so a file of the right size
+        # with the right name is already up to date
+        try:
+            if os.stat(destination).st_size == asset.size:
+                return False
+        except FileNotFoundError:
+            pass
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{destination}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(asset.source, tmp_path)
+            os.replace(tmp_path, destination)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return True
+
+    def _relative(self, path: str) -> str:
+        # LaTeX wants forward slashes on every platform
+        assert self.output_dir is not None
+        return os.path.relpath(path, self.output_dir).replace(os.sep, "/")
+
+    def _load_cache(self) -> Dict[str, _Stamp]:
+        if self.cache_path is None:
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {path: tuple(stamp) for path, stamp in data["files"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            # A missing or unreadable cache only costs re-hashing
+            return {}
+
+    def _save_cache(self) -> None:
+        if self.cache_path is None:
+            return
+        with self._lock:
+            data = {"version": 1, "files": dict(sorted(self._cache.items()))}
+        write_if_changed(
+            self.cache_path, lambda f: json.dump(data, f), compression=None
+        )
+
+
+def _candidates(directory: str, path: str) -> Tuple[str, ...]:
+    """Files an image path may refer to, in the order graphicx tries them."""
+    full_path = os.path.normpath(os.path.join(directory, path))
+    if os.path.splitext(path)[1]:
+        return (full_path,)
+    return (full_path,) + tuple(full_path + ext for ext in IMAGE_EXTENSIONS)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return digest.hexdigest()
+            digest.update(chunk)
@@ -0,0 +1,115 @@
+from typing import Optional, TextIO, Type
+
+from . import markdown as xwm
+from .includes import IncludeResolver
+from .limits import ParserLimits
+from .render import LatexRenderer
+from .streams import open_text_reader, read_lines
+from .tex_config import FrozenTexConfig, TexConfig
+from .tex_parser import TexParser
+
+__all__ = ["Converter"]
+
+
+class Converter:
+    """
+    Reusable Markdown to LaTeX converter.
+
+    A Converter holds a frozen snapshot of its configuration and creates
+    fresh parser and renderer state for every call, so one instance can be
+    shared by any number of threads (for example from a ThreadPoolExecutor,
+    including on free-threaded CPython builds). Parsers are cheap to create,
+    so they are not pooled.
+
+    Example:
+        converter = Converter(TexConfig("presentation"))
+        with ThreadPoolExecutor() as pool:
+            outputs = list(pool.map(converter.convert, sources))
+    """
+
+    def __init__(
+        self,
+        config: Optional[TexConfig] = None,
+        limits: Optional[ParserLimits] = None,
+        resolver: Optional[IncludeResolver] = None,
+        renderer_class: Type[LatexRenderer] = LatexRenderer,
+    ):
+        """
+        Args:
+            config: Template configuration (defaults to the default template);
+                a frozen copy is taken, so later changes to it have no effect
+            limits: Parser limits applied to every conversion
+            resolver: IncludeResolver to share between conversions, so that
+                included files are cached; by default each call uses its own
+            renderer_class: LatexRenderer subclass used for rendering
+        """
+        if config is None:
+            config = TexConfig("default")
+        self.config: FrozenTexConfig = config.freeze()
+        self.limits = limits
+        self.resolver = resolver
+        self.renderer_class = renderer_class
+
+    def parser(
+        self, source_path: Optional[str] = None, section: Optional[str] = None
+    ) -> TexParser:
+        """Create a parser with fresh state."""
+        return TexParser(
+            resolver=self.resolver,
+            source_path=source_path,
+            limits=self.limits,
+            section=section,
+        )
+
+    def renderer(self) -> LatexRenderer:
+        """Create a renderer with fresh state."""
+        return self.renderer_class(self.config)
+
+    def parse(
+        self,
+        markdown_text: str,
+        source_path: Optional[str] = None,
+        section: Optional[str] = None,
+    ) -> "xwm.Document":
+        """
+        Parse Markdown into a document.
+
+        If `section` is given, only that section is returned (see
+        `Document.subdocument`).
+        """
+        parser = self.parser(source_path=source_path, section=section)
+        parser.parse(markdown_text)
+        if section is not None:
+            return parser.doc.subdocument(section)
+        return parser.doc
+
+    def parse_file(
+        self, input_file: str, section: Optional[str] = None
+    ) -> "xwm.Document":
+        """
+        Parse a Markdown file; include paths are relative to it.
+
+        Compressed files are detected and decompressed as they are parsed.
+        """
+        parser = self.parser(source_path=input_file, section=section)
+        with open_text_reader(input_file) as f:
+            parser.parse_lines(read_lines(f, parser.limits.max_line_length))
+        if section is not None:
+            return parser.doc.subdocument(section)
+        return parser.doc
+
+    def convert(
+        self,
+        markdown_text: str,
+        source_path: Optional[str] = None,
+        section: Optional[str] = None,
+    ) -> str:
+        """Convert Markdown to a complete LaTeX document."""
+        document = self.parse(markdown_text, source_path, section)
+        return self.renderer().render_document(document)
+
+    def write(self, document: "xwm.Document", out: TextIO) -> LatexRenderer:
+        """Render a document to a text stream; returns the renderer used."""
+        renderer = self.renderer()
+        renderer.write_document(document, out)
+        return renderer
@@ -1,10 +1,18 @@
 import argparse
+import os
+from typing import List, Optional
 
-from . import TexParser
+from .assets import ASSET_CACHE_NAME, AssetPipeline, AssetReport
+from .converter import Converter
+from .includes import IncludeResolver
+from .markdown import Document, Section
+from .output import write_if_changed
+from .sourcemap import SourceMap, source_map_path
+from .streams import split_compression_suffix
 from .tex_config import TexConfig
 
 
-def main():
+def main() -> None:
     """Main entry point for the TexWeaver CLI."""
     parser = argparse.ArgumentParser(
         description="TexWeaver - Convert Markdown to LaTeX using customizable templates"
@@ -35,6 +43,51 @@ def main():
         "--template-info", help="Show information about a specific template"
     )
 
+    parser.add_argument(
+        "-s",
+        "--section",
+        help='Only convert one section, given as a path of headings (e.g. "Chapter 3/Results")',
+    )
+
+    parser.add_argument(
+        "--outline",
+        action="store_true",
+        help="Print the section outline of the input file and exit",
+    )
+
+    parser.add_argument(
+        "--list-deps",
+        action="store_true",
+        help="Print the files included (transitively) by the input file and exit",
+    )
+
+    parser.add_argument(
+        "--source-map",
+        action="store_true",
+        help="Also write a source map (output.tex -> output.tex.map) from LaTeX lines to Markdown lines",
+    )
+
+    parser.add_argument(
+        "--check-images",
+        action="store_true",
+        help="Check that every image exists, resolving paths relative to the Markdown file that references it",
+    )
+
+    parser.add_argument(
+        "--copy-images",
+        nargs="?",
+        const="images",
+        metavar="DIR",
+        help="Check images and copy them into DIR (default: 'images') next to the output file",
+    )
+
+    parser.add_argument(
+        "--lookup",
+        type=int,
+        metavar="LINE",
+        help="Print the Markdown lines that produced LINE of a LaTeX file (given as input_file) and exit",
+    )
+
     args = parser.parse_args()
 
     # Handle list templates request
@@ -51,19 +104,45 @@ def main():
     if not args.input_file:
         parser.error("input_file is required for conversion")
 
-    # Generate default output file name if not provided
+    # Handle source map lookup request
+    if args.lookup is not None:
+        lookup_source(args.input_file, args.lookup)
+        return
+
+    # Handle dependency listing request
+    if args.list_deps:
+        list_dependencies(args.input_file)
+        return
+
+    # Handle outline request
+    if args.outline:
+        show_outline(args.input_file)
+        return
+
+    # Generate default output file name if not provided; compressed input
+    # (e.g. book.md.gz) gives output compressed the same way (book.tex.gz)
     output_file = args.output_file
     if not output_file:
-        if args.input_file.endswith(".md"):
-            output_file = args.input_file[:-3] + ".tex"
+        base, compression_suffix = split_compression_suffix(args.input_file)
+        if base.endswith(".md"):
+            output_file = base[:-3] + ".tex" + compression_suffix
         else:
-            output_file = args.input_file + ".tex"
+            output_file = base + ".tex" + compression_suffix
 
     # Process the input file and generate the output file
-    process_file(args.input_file, output_file, args.template, args.config)
+    process_file(
+        args.input_file,
+        output_file,
+        args.template,
+        args.config,
+        args.section,
+        args.source_map,
+        args.check_images,
+        args.copy_images,
+    )
 
 
-def list_templates():
+def list_templates() -> None:
     """List all available templates."""
     templates = TexConfig.list_available_templates()
     print("Available templates:")
@@ -80,7 +159,7 @@ def list_templates():
     print("\nUsage: texweaver -t <template_name> input.md output.tex")
 
 
-def show_template_info(template_name):
+def show_template_info(template_name: str) -> None:
     """Show detailed information about a specific template."""
     try:
         config = TexConfig(template_name)
@@ -98,8 +177,98 @@ def show_template_info(template_name):
         print("Use --list-templates to see available templates.")
 
 
-def process_file(input_file, output_file, template_name="default", config_file=None):
-    """Process the input file and generate the output file."""
+def list_dependencies(input_file: str) -> None:
+    """Print the files included by the input file, one per line."""
+    try:
+        resolver = IncludeResolver()
+        resolver.load(input_file)
+        for path in resolver.dependencies(input_file, transitive=True):
+            print(path)
+    except FileNotFoundError as e:
+        print(f"Error: File not found - {e}")
+    except Exception as e:
+        print(f"Error processing file: {e}")
+
+
+def show_outline(input_file: str) -> None:
+    """Print the section tree of the input file."""
+
+    def show(sections: List[Section], depth: int) -> None:
+        for section in sections:
+            label = f"  [{section.label}]" if section.label else ""
+            print(f"{'  ' * depth}{section.title}{label}")
+            show(section.children, depth + 1)
+
+    try:
+        show(Converter().parse_file(input_file).outline, 0)
+    except FileNotFoundError as e:
+        print(f"Error: File not found - {e}")
+    except Exception as e:
+        print(f"Error processing file: {e}")
+
+
+def lookup_source(latex_file: str, line: int) -> None:
+    """Print the Markdown lines that produced a line of a LaTeX file."""
+    path = latex_file if latex_file.endswith(".map") else source_map_path(latex_file)
+    try:
+        location = SourceMap.load(path).lookup(line)
+    except FileNotFoundError:
+        print(f"Error: No source map '{path}'; convert with --source-map first")
+        return
+    except Exception as e:
+        print(f"Error reading source map: {e}")
+        return
+    if location is None:
+        print(f"Line {line} was not generated from Markdown")
+    else:
+        print(location)
+
+
+def check_assets(
+    doc: Document, output_file: str, image_dir: Optional[str] = None
+) -> AssetReport:
+    """Resolve, check and optionally copy the images of a document."""
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    pipeline = AssetPipeline(
+        output_dir,
+        copy_dir=image_dir,
+        cache_path=os.path.join(output_dir, ASSET_CACHE_NAME),
+    )
+    report = pipeline.process(doc)
+    for missing in report.missing:
+        print(f"Warning: {missing}")
+    if image_dir is not None:
+        print(f"Copied {report.copied} of {len(report.assets)} images to '{image_dir}'")
+    return report
+
+
+def process_file(
+    input_file: str,
+    output_file: str,
+    template_name: str = "default",
+    config_file: Optional[str] = None,
+    section: Optional[str] = None,
+    source_map: bool = False,
+    check_images: bool = False,
+    image_dir: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Process the input file and generate the output file.
+
+    If `section` is given, only that section (a path of headings such as
+    "Chapter 3/Results") is converted, with the template's usual preamble.
+    If `source_map` is true, a source map is written next to the output
+    (see `source_map_path`).
+
+    If `check_images` is true or `image_dir` is given, image paths are resolved
+    relative to the Markdown files, missing images are reported, and the
+    LaTeX refers to the images relative to the output directory; with
+    `image_dir` they are also copied into that directory next to the output
+    (see `AssetPipeline`).
+
+    The output file is only replaced if its content changed. Returns "written"
+    or "unchanged", or None if the conversion failed.
+    """
     try:
         # Create configuration
         if config_file:
@@ -108,27 +277,33 @@ def process_file(input_file, output_file, template_name="default", config_file=N
             config = TexConfig(template_name)
 
         # Parse markdown
-        parser = TexParser()
-        with open(input_file, "r", encoding="utf-8") as f:
-            src = f.read()
-            parser.parse(src)
-
-        # Generate LaTeX
-        doc = parser.doc
-        latex_content = doc.to_latex(config)
+        converter = Converter(config)
+        doc = converter.parse_file(input_file, section=section)
+        if check_images or image_dir is not None:
+            check_assets(doc, output_file, image_dir)
 
-        # Write output
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(latex_content)
+        # Generate LaTeX and write it out chunk by chunk
+        renderer = converter.renderer()
+        sourcemap = renderer.source_map = SourceMap() if source_map else None
+        written = write_if_changed(
+            output_file, lambda f: renderer.write_document(doc, f)
+        )
+        if sourcemap is not None:
+            write_if_changed(source_map_path(output_file), sourcemap.write)
+        status = "written" if written else "unchanged"
+        for label in dict.fromkeys(renderer.unresolved_references):
+            print(f"Warning: reference to unknown label '{label}'")
 
         print(
-            f"Successfully converted '{input_file}' to '{output_file}' using template '{template_name}'"
+            f"Successfully converted '{input_file}' to '{output_file}' using template '{template_name}' ({status})"
         )
+        return status
 
     except FileNotFoundError as e:
         print(f"Error: File not found - {e}")
     except Exception as e:
         print(f"Error processing file: {e}")
+    return None
 
 
 if __name__ == "__main__":
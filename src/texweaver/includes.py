@@ -0,0 +1,241 @@
+import os
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from . import markdown as xwm
+from .limits import DEFAULT_LIMITS, ParserLimits
+from .streams import open_text_reader, read_lines
+
+__all__ = ["IncludeError", "IncludeCycleError", "IncludeResolver"]
+
+
+class IncludeError(Exception):
+    """Raised when an include directive cannot be resolved."""
+
+
+class IncludeCycleError(IncludeError):
+    """Raised when include directives form a cycle."""
+
+    def __init__(self, chain: List[str]):
+        self.chain = chain
+        super().__init__("Include cycle detected: " + " -> ".join(chain))
+
+
+class _CacheEntry:
+    def __init__(
+        self,
+        stamp: Tuple[int, int],
+        document: "xwm.Document",
+        includes: List["xwm.Include"],
+        limits: ParserLimits,
+    ) -> None:
+        self.stamp = stamp
+        self.document = document
+        self.includes = includes
+        # The limits the file was parsed and its includes checked under
+        self.limits = limits
+
+
+class IncludeResolver:
+    """
+    Resolve include directives into sub-documents.
+
+    The resolver keeps a per-file cache of parsed documents keyed by the file's
+    modification time and size, so a file is only re-parsed when it changed on
+    disk. It also records the include dependency graph, which build systems can
+    query through `dependencies` and `dependents`.
+
+    A resolver may be shared between threads: each thread tracks its own
+    include stack, and the cache and graph are updated under a lock. Two
+    threads loading the same changed file at once may both parse it.
+
+    Files are parsed under the limits of the parser that includes them, so
+    an include root or a ban on includes applies to the whole include tree.
+    A cached parse is only reused under the same `ParserLimits` object.
+    """
+
+    def __init__(self, limits: Optional[ParserLimits] = None):
+        """
+        Args:
+            limits: Parser limits for files loaded without explicit limits
+        """
+        self.limits = limits if limits is not None else DEFAULT_LIMITS
+        self._cache: Dict[str, _CacheEntry] = {}
+        self._graph: Dict[str, Set[str]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.parse_count = 0
+
+    @property
+    def _stack(self) -> List[str]:
+        # Files being parsed by the current thread, outermost first
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        """Return the canonical key used for a file in the cache and graph."""
+        return os.path.realpath(path)
+
+    def load(self, path: str, limits: Optional[ParserLimits] = None) -> "xwm.Document":
+        """
+        Parse a file (or reuse its cached parse) and return its document.
+
+        Args:
+            path: File to load
+            limits: Limits to parse it and its includes under (defaults to
+                the resolver's)
+        """
+        if limits is None:
+            limits = self.limits
+        key = self.normalize(path)
+        if key in self._stack:
+            chain = self._stack[self._stack.index(key) :] + [key]
+            raise IncludeCycleError(chain)
+
+        stamp = self._stamp(key)
+        stack = self._stack
+        stack.append(key)
+        try:
+            with self._lock:
+                entry = self._cache.get(key)
+            if entry is not None and entry.stamp == stamp and entry.limits is limits:
+                # The file itself is unchanged; refresh its includes, which
+                # only re-parses the fragments that changed. Their labels may
+                # have changed too, so the document's label index is rebuilt.
+                for node in entry.includes:
+                    node.document = self.load(node.path, limits)
+                entry.document.reset_labels()
+                return entry.document
+
+            entry = self._parse(key, stamp, limits)
+            with self._lock:
+                self._cache[key] = entry
+            return entry.document
+        finally:
+            stack.pop()
+
+    def include(
+        self,
+        path: str,
+        base_dir: Optional[str] = None,
+        limits: Optional[ParserLimits] = None,
+    ) -> "xwm.Include":
+        """
+        Create an include node for `path`, resolved relative to `base_dir`.
+
+        The file is loaded under `limits`, as for `load`.
+        """
+        if base_dir is not None and not os.path.isabs(path):
+            full_path = os.path.join(base_dir, path)
+        else:
+            full_path = path
+        key = self.normalize(full_path)
+        stack = self._stack
+        if stack:
+            with self._lock:
+                self._graph.setdefault(stack[-1], set()).add(key)
+        return xwm.Include(key, self.load(key, limits))
+
+    @property
+    def node_count(self) -> int:
+        """Nodes counted so far in the include tree the current thread parses."""
+        count: int = getattr(self._local, "nodes", 0)
+        return count
+
+    def count_nodes(self, count: int) -> int:
+        """Add to `node_count` and return the new total."""
+        total = self.node_count + count
+        self._local.nodes = total
+        return total
+
+    def reset_node_count(self, count: int = 0) -> None:
+        """Start counting nodes for a new include tree."""
+        self._local.nodes = count
+
+    @property
+    def depth(self) -> int:
+        """Number of files currently being parsed, outermost first."""
+        return len(self._stack)
+
+    def enter(self, path: str) -> None:
+        """Mark `path` as being parsed, for parsers that read the file themselves."""
+        key = self.normalize(path)
+        with self._lock:
+            self._graph[key] = set()
+        self._stack.append(key)
+
+    def exit(self) -> None:
+        """Undo the matching `enter` call."""
+        self._stack.pop()
+
+    def dependencies(self, path: str, transitive: bool = False) -> List[str]:
+        """List the files included by `path`."""
+        key = self.normalize(path)
+        with self._lock:
+            graph = {k: set(v) for k, v in self._graph.items()}
+        if not transitive:
+            return sorted(graph.get(key, ()))
+        return sorted(self._walk(key, graph))
+
+    def dependents(self, path: str, transitive: bool = False) -> List[str]:
+        """List the files that include `path`."""
+        reverse: Dict[str, Set[str]] = {}
+        with self._lock:
+            graph = {k: set(v) for k, v in self._graph.items()}
+        for parent, children in graph.items():
+            for child in children:
+                reverse.setdefault(child, set()).add(parent)
+        key = self.normalize(path)
+        if not transitive:
+            return sorted(reverse.get(key, ()))
+        return sorted(self._walk(key, reverse))
+
+    @property
+    def graph(self) -> Dict[str, List[str]]:
+        """The include graph as a mapping from file to the files it includes."""
+        with self._lock:
+            return {k: sorted(v) for k, v in self._graph.items()}
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Drop the cached parse for `path`, or the whole cache."""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(self.normalize(path), None)
+
+    def _parse(
+        self, key: str, stamp: Tuple[int, int], limits: ParserLimits
+    ) -> _CacheEntry:
+        from .tex_parser import TexParser
+
+        with self._lock:
+            self._graph[key] = set()
+        parser = TexParser(resolver=self, base_dir=os.path.dirname(key), limits=limits)
+        parser.doc.source_path = key
+        with open_text_reader(key) as f:
+            parser.parse_lines(read_lines(f, parser.limits.max_line_length))
+        with self._lock:
+            self.parse_count += 1
+        includes = [c for c in parser.doc.components if isinstance(c, xwm.Include)]
+        return _CacheEntry(stamp, parser.doc, includes, limits)
+
+    @staticmethod
+    def _stamp(key: str) -> Tuple[int, int]:
+        st = os.stat(key)
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _walk(start: str, edges: Dict[str, Set[str]]) -> Set[str]:
+        seen: Set[str] = set()
+        pending = list(edges.get(start, ()))
+        while pending:
+            node = pending.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            pending.extend(edges.get(node, ()))
+        return seen
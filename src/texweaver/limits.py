@@ -0,0 +1,59 @@
+from typing import Optional
+
+__all__ = ["ParseLimitError", "ParserLimits", "DEFAULT_LIMITS"]
+
+
+class ParseLimitError(ValueError):
+    """Raised when a document exceeds one of the configured parser limits."""
+
+    def __init__(self, message: str, line_number: Optional[int] = None):
+        self.line_number = line_number
+        if line_number is not None:
+            message = f"line {line_number}: {message}"
+        super().__init__(message)
+
+
+class ParserLimits:
+    """
+    Resource limits applied while parsing untrusted Markdown.
+
+    Parsing is linear in the size of the input, so these limits bound memory
+    and output size rather than guard against slow paths. Set a limit to None
+    to disable it.
+
+    Explicit limits are meant for untrusted input, so `!include` directives
+    are refused unless `include_root` or `allow_includes` is given; a parser
+    created without limits uses DEFAULT_LIMITS, which allows them.
+    """
+
+    def __init__(
+        self,
+        max_line_length: Optional[int] = 1_000_000,
+        max_nesting: Optional[int] = 64,
+        max_nodes: Optional[int] = None,
+        allow_includes: Optional[bool] = None,
+        include_root: Optional[str] = None,
+    ):
+        """
+        Args:
+            max_line_length: Maximum number of characters in a single line
+            max_nesting: Maximum depth of nested include directives
+            max_nodes: Maximum number of document nodes, inline nodes included,
+                counted over the whole include tree
+            allow_includes: Whether include directives are followed (default:
+                only if `include_root` is given)
+            include_root: Directory that included files must be inside, after
+                symbolic links are resolved
+        """
+        self.max_line_length = max_line_length
+        self.max_nesting = max_nesting
+        self.max_nodes = max_nodes
+        if allow_includes is None:
+            allow_includes = include_root is not None
+        self.allow_includes = allow_includes
+        self.include_root = include_root
+
+
+# Limits used when a parser is created without explicit limits, for trusted
+# input: includes may name any file
+DEFAULT_LIMITS = ParserLimits(allow_includes=True)
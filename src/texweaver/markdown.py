@@ -1,363 +1,717 @@
 import json
-
+import re
+from array import array
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Tuple,
+)
+
+from ._compiled import mypyc_attr
 from .tex_config import TexConfig
 
+if TYPE_CHECKING:
+    from .render import LatexRenderer
+
+# The (document, index) pairs leading from a root document to a heading
+Chain = Tuple[Tuple["Document", int], ...]
+
+
+def _renderer(config: TexConfig) -> "LatexRenderer":
+    # Imported lazily: the render module dispatches on the classes below
+    from .render import LatexRenderer
+
+    return LatexRenderer(config)
 
-def preprocess_text(text):
+
+def _render(node: Any, config: TexConfig) -> str:
+    latex: str = _renderer(config).visit(node)
+    return latex
+
+
+def preprocess_text(text: str) -> str:
     # replace underscores with \_
     text = text.replace("_", r"\_")
     return text
 
 
-class Document:
-    def __init__(self):
-        self.components = []
-
-    def add_component(self, component):
-        self.components.append(component)
-
-    def to_latex(self, config: TexConfig):
-        """Generate a complete LaTeX document."""
-        # Get document structure from template
-        preamble = config.apply("document", "preamble", content="")
-        begin_document = config.apply("document", "begin_document", content="")
-        end_document = config.apply("document", "end_document", content="")
-
-        # If no document structure is defined, use fallback
-        if not preamble:
-            preamble = self._get_default_preamble()
-        if not begin_document:
-            begin_document = "\\begin{document}\n"
-        if not end_document:
-            end_document = "\\end{document}"
-
-        # Check if this is a presentation template
-        is_presentation = "beamer" in preamble.lower()
-
-        if is_presentation:
-            # For presentations, wrap content in frames
-            content = self._generate_presentation_content(config)
-        else:
-            # Generate regular content
-            content = "\n".join([c.to_latex(config) for c in self.components])
+def slugify(text: str) -> str:
+    """Turn text into a label-safe slug (lowercase ASCII words joined by '-')."""
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
 
-        # Combine everything
-        return f"{preamble}\n{begin_document}\n{content}\n{end_document}"
 
-    def _generate_presentation_content(self, config: TexConfig):
-        """Generate content for Beamer presentations with proper frame structure."""
-        if not self.components:
-            return ""
+def auto_label(node: Any) -> Optional[str]:
+    """The label a heading or image gets if it has none, or None for other nodes."""
+    auto = _AUTO_LABELS.get(type(node))
+    if auto is None:
+        return None
+    prefix, default = auto
+    title: Content = node.title if type(node) is Heading else node.caption
+    return f"{prefix}:{slugify(title.plain_text()) or default}"
 
-        result = []
-        current_frame_content = []
-        frame_started = False
 
-        for component in self.components:
-            if isinstance(component, SlideBreak):
-                # End current frame and start new one
-                if frame_started:
-                    result.append("\\end{frame}\n")
-
-                # Check if next slide will have code blocks
-                next_slide_components = self._get_next_slide_components(component)
-                has_code = any(
-                    isinstance(comp, CodeBlock) for comp in next_slide_components
-                )
-
-                if has_code:
-                    result.append("\\begin{frame}[fragile]")
-                else:
-                    result.append("\\begin{frame}")
-                frame_started = True
-                current_frame_content = []
+@mypyc_attr(allow_interpreted_subclasses=True)
+class Document:
+    def __init__(self) -> None:
+        self.components: List[Any] = []
+        # Labels made unique within this file, and the label each suffixed
+        # label was made from; see LabelIndex for document-wide labels
+        self._labels: MutableMapping[str, Any] = {}
+        self._label_aliases: Dict[str, str] = {}
+        self._label_bases: Dict[str, str] = {}
+        self._label_counts: Dict[str, int] = {}
+        # Labeled nodes and includes in document order, including the labels
+        # of nodes that were not added (see add_label)
+        self._label_items: List[Any] = []
+        # Index and scope of a subdocument's labels in its parent document
+        self._label_scope: Optional[Tuple[LabelIndex, int]] = None
+        # Document-wide label index, built on first use
+        self._label_index: Optional[LabelIndex] = None
+        self._includes: List[Include] = []
+        # (index, node) of headings and includes, for the outline
+        self._outline_items: List[Tuple[int, Any]] = []
+        # Path of the Markdown file the document was parsed from, if any
+        self.source_path: Optional[str] = None
+        # Line on which each component starts (0 if unknown), kept in a side
+        # table aligned with `components` rather than on every node
+        self.source_lines: "array[int]" = array("L")
+        # Number of lines in the source
+        self.line_count = 0
+        # Number of nodes parsed for this document, not counting includes
+        self.node_count = 0
+
+    def add_component(self, component: Any, line: int = 0) -> None:
+        self.components.append(component)
+        self.source_lines.append(line)
+        kind = type(component)
+        if kind is Include:
+            self._includes.append(component)
+            self._label_items.append(component)
+            self._label_index = None
+            self._outline_items.append((len(self.components) - 1, component))
+        elif kind in _LABELED_TYPES:
+            self.add_label(component)
+            if kind is Heading:
+                self._outline_items.append((len(self.components) - 1, component))
+
+    def add_label(self, node: Any) -> None:
+        """
+        Assign a unique label to a node and index it.
+
+        Called by `add_component`; the parser also calls it for nodes it skips
+        when parsing only one section, so that labels elsewhere in the
+        document keep the same suffixes and references to them resolve.
+        """
+        label = node.label
+        if label is None:
+            label = auto_label(node)
+            if label is None:
+                return
+
+        unique = _unique_label(label, self._labels, self._label_counts)
+        if unique != label:
+            self._label_bases[unique] = label
+        node.label = unique
+        self._labels[unique] = node
+        self._label_items.append(node)
+        self._label_index = None
+        # Allow references without the "sec:"/"fig:"/"eq:" prefix
+        _, sep, bare = unique.partition(":")
+        if sep:
+            self._label_aliases.setdefault(bare, unique)
+
+    def label_scope(self) -> Tuple["LabelIndex", int]:
+        """
+        Return the document-wide label index and the scope of this document.
+
+        The index is built on first use and kept until a label or include is
+        added or `reset_labels` is called. For a subdocument, it is the index
+        of the document the section was taken from.
+        """
+        if self._label_scope is not None:
+            return self._label_scope
+        if self._label_index is None:
+            self._label_index = LabelIndex(self)
+        return self._label_index, 0
+
+    def reset_labels(self) -> None:
+        """Drop the cached label index, after an included document changed."""
+        self._label_index = None
+
+    @property
+    def labels(self) -> MutableMapping[str, Any]:
+        """Mapping from label to node, including labels of included files."""
+        if not self._includes and self._label_scope is None:
+            return self._labels
+        return self.label_scope()[0].labels
+
+    @property
+    def label_aliases(self) -> MutableMapping[str, str]:
+        """Mapping from labels without their prefix to the full label."""
+        return self.label_scope()[0].aliases
+
+    def resolve_label(self, name: str) -> Optional[str]:
+        """Return the full label for a reference target, or None if unknown."""
+        return self.label_scope()[0].resolve(name)
+
+    @property
+    def outline(self) -> List["Section"]:
+        """
+        The section tree of this document, including sections of included files.
+
+        A section spans from its heading to the next heading of the same or a
+        higher rank in the same file, or to the end of that file.
+        """
+        roots: List[Section] = []
+        stack: List[Section] = []
+        labels, scope = self.label_scope()
+        for chain, heading in self._iter_headings(()):
+            while stack and stack[-1].level >= heading.level:
+                stack.pop()._close(chain)
+            document, index = chain[-1]
+            section = Section(heading, document, index)
+            section.label = labels.label(labels.chain_scope(chain, scope), heading)
+            section.chain = chain
+            (stack[-1].children if stack else roots).append(section)
+            stack.append(section)
+        return roots
+
+    def _iter_headings(self, chain: Chain) -> Iterator[Tuple[Chain, "Heading"]]:
+        # Yields (chain, heading); chain lists the (document, index) pairs
+        # leading from the root document to the heading.
+        for index, node in self._outline_items:
+            if type(node) is Include:
+                yield from node.document._iter_headings(chain + ((self, index),))
             else:
-                if not frame_started:
-                    # Start first frame, check if it has code blocks
-                    first_slide_components = self._get_first_slide_components()
-                    has_code = any(
-                        isinstance(comp, CodeBlock) for comp in first_slide_components
-                    )
-
-                    if has_code:
-                        result.append("\\begin{frame}[fragile]")
-                    else:
-                        result.append("\\begin{frame}")
-                    frame_started = True
-                result.append(component.to_latex(config))
-
-        # Close the last frame if needed
-        if frame_started:
-            result.append("\\end{frame}")
-
-        return "\n".join(result)
-
-    def _get_next_slide_components(self, slide_break):
-        """Get components for the next slide after a slide break."""
-        try:
-            slide_break_index = self.components.index(slide_break)
-            next_components = []
-
-            for i in range(slide_break_index + 1, len(self.components)):
-                if isinstance(self.components[i], SlideBreak):
+                yield chain + ((self, index),), node
+
+    def find_section(self, path: str) -> "Section":
+        """
+        Find a section by its path of heading titles, e.g. "Chapter 3/Results".
+
+        Each part may also be the heading's label, with or without "sec:".
+        Raises LookupError if there is no such section.
+        """
+        parts = [p.strip() for p in path.split("/") if p.strip()]
+        if not parts:
+            raise LookupError(f"Invalid section path '{path}'")
+        sections = self.outline
+        for part in parts:
+            for section in sections:
+                if section.matches(part):
                     break
-                next_components.append(self.components[i])
+            else:
+                raise LookupError(f"No section '{part}' in section path '{path}'")
+            sections = section.children
+        return section
+
+    def subdocument(self, path: str) -> "Document":
+        """Return a document containing only the section at `path`."""
+        section = self.find_section(path)
+        document = Document()
+        document.components = section.components
+        document.source_path = section.document.source_path
+        lines = section.document.source_lines
+        document.source_lines = lines[section.start : section.end]
+        if section.end < len(lines):
+            document.line_count = lines[section.end] - 1
+        else:
+            document.line_count = section.document.line_count
+        # Labels are those of the whole document, so references into the
+        # rest of it still resolve
+        labels, scope = self.label_scope()
+        document._label_scope = (labels, labels.chain_scope(section.chain, scope))
+        return document
+
+    @property
+    def total_node_count(self) -> int:
+        """Number of nodes in the document and its included documents."""
+        return self.node_count + sum(
+            include.document.total_node_count for include in self._includes
+        )
 
-            return next_components
-        except ValueError:
-            return []
+    def iter_components(self) -> Iterator[Any]:
+        """Iterate over components, expanding included sub-documents in place."""
+        for component in self.components:
+            if isinstance(component, Include):
+                yield from component.document.iter_components()
+            else:
+                yield component
+
+    def iter_indexed(self) -> Iterator[Tuple["Document", int, Any]]:
+        """
+        Like `iter_components`, but yields (document, index, component).
+
+        `document` is the (possibly included) document the component belongs
+        to and `index` its position there.
+        """
+        for index, component in enumerate(self.components):
+            if isinstance(component, Include):
+                yield from component.document.iter_indexed()
+            else:
+                yield self, index, component
 
-    def _get_first_slide_components(self):
-        """Get components for the first slide."""
-        first_slide_components = []
+    def to_latex(self, config: TexConfig) -> str:
+        """Generate a complete LaTeX document."""
+        return _renderer(config).render_document(self)
 
-        for component in self.components:
-            if isinstance(component, SlideBreak):
-                break
-            first_slide_components.append(component)
-
-        return first_slide_components
-
-    def _get_default_preamble(self):
-        """Fallback LaTeX preamble if template doesn't provide one."""
-        return """\\documentclass{article}
-\\usepackage[utf8]{inputenc}
-\\usepackage[T1]{fontenc}
-\\usepackage{amsmath}
-\\usepackage{amsfonts}
-\\usepackage{amssymb}
-\\usepackage{graphicx}
-\\usepackage{float}
-\\usepackage{listings}
-\\usepackage{xcolor}"""
-
-    def to_json(self):
+    def to_json(self) -> str:
         obj = {"type": "document", "components": [c.to_json() for c in self.components]}
         json_str = json.dumps(obj, indent=4)
         return json_str
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class Content:
-    def __init__(self):
-        self.components = []
+    def __init__(self) -> None:
+        self.components: List[Any] = []
 
-    def add_component(self, component):
+    def add_component(self, component: Any) -> None:
         self.components.append(component)
 
-    def to_latex(self, config: TexConfig):
-        return "".join([c.to_latex(config) for c in self.components])
+    def plain_text(self) -> str:
+        """The text of all components without formatting."""
+        return "".join([getattr(c, "text", "") for c in self.components])
 
-    def to_json(self):
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
+
+    def to_json(self) -> Dict[str, Any]:
         return {"type": "content", "components": [c.to_json() for c in self.components]}
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class Text:
-    def __init__(self, text: str):
+    def __init__(self, text: str) -> None:
         self.text = preprocess_text(text)
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple("text", content=self.text)
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {"type": "text", "text": self.text}
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class InlineBold:
-    def __init__(self, text: str):
+    def __init__(self, text: str) -> None:
         self.text = preprocess_text(text)
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple("bold", content=self.text)
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {"type": "inline_bold", "text": self.text}
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class InlineItalic:
-    def __init__(self, text: str):
+    def __init__(self, text: str) -> None:
         self.text = preprocess_text(text)
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple("italic", content=self.text)
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {"type": "inline_italic", "text": self.text}
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class InlineCode:
-    def __init__(self, text: str):
+    def __init__(self, text: str) -> None:
         self.text = preprocess_text(text)
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple("inline_code", content=self.text)
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {"type": "inline_code", "text": self.text}
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class InlineFormula:
-    def __init__(self, text: str):
+    def __init__(self, text: str) -> None:
         self.text = text
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple("inline_formula", content=self.text)
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {"type": "inline_formula", "text": self.text}
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class Paragraph:
-    def __init__(self, content: Content):
+    def __init__(self, content: Content) -> None:
         self.content = content
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple("paragraph", content=self.content.to_latex(config))
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {"type": "paragraph", "content": self.content.to_json()}
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
+class Reference:
+    """A reference to a labeled heading, image or formula ([text](#label))."""
+
+    def __init__(self, label: str, text: str = "") -> None:
+        self.label = label
+        self.text = preprocess_text(text)
+
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"type": "reference", "label": self.label, "text": self.text}
+
+
+@mypyc_attr(allow_interpreted_subclasses=True)
 class FormulaBlock:
-    def __init__(self, text):
+    def __init__(self, text: str, label: Optional[str] = None) -> None:
         self.text = text
+        self.label = label
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple("block_formula", content=self.text)
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
-        return {"type": "formula_block", "text": self.text}
+    def to_json(self) -> Dict[str, Any]:
+        return {"type": "formula_block", "text": self.text, "label": self.label}
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class CodeBlock:
-    def __init__(self, lang=None):
+    def __init__(self, lang: Optional[str] = None) -> None:
         self.lang = lang if lang else "text"
-        self.code = []
+        self.code: List[str] = []
 
-    def add_code(self, code):
+    def add_code(self, code: str) -> None:
         self.code.append(code)
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple(
-            "code_block", code="\n".join(self.code), lang=self.lang
-        )
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {"type": "code_block", "code": self.code, "lang": self.lang}
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class Image:
-    def __init__(self, path: str, caption: Content):
+    def __init__(
+        self, path: str, caption: Content, label: Optional[str] = None
+    ) -> None:
         self.path = path
         self.caption = caption
+        self.label = label
+        # Path given to the template instead of `path`, set by AssetPipeline
+        self.resolved_path: Optional[str] = None
 
-    def to_latex(self, config: TexConfig):
-        # Generate a simple label from the caption text
-        caption_text = self.caption.to_latex(config)
-        label = (
-            caption_text.replace(" ", "_")
-            .replace("\\", "")
-            .replace("{", "")
-            .replace("}", "")
-            .lower()[:20]
-        )
-        if not label:
-            label = "image"
-        return config.apply_simple(
-            "image", src=self.path, alt=caption_text, width="0.8", label=label
-        )
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
-        return {"type": "image", "path": self.path, "caption": self.caption.to_json()}
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "type": "image",
+            "path": self.path,
+            "caption": self.caption.to_json(),
+            "label": self.label,
+        }
+
+
+@mypyc_attr(allow_interpreted_subclasses=True)
+class Table:
+    """
+    A pipe table.
+
+    Rows are tuples of cells; a cell is a pre-escaped string, or a Content
+    when it contains inline markup. Avoiding per-cell node objects keeps
+    tables with many rows compact.
+    """
+
+    def __init__(self, header: Tuple[Any, ...], alignment: str) -> None:
+        self.header = header
+        self.alignment = alignment
+        self.rows: List[Tuple[Any, ...]] = []
+        self.caption: Optional[Content] = None
+
+    def add_row(self, row: Tuple[Any, ...]) -> None:
+        self.rows.append(row)
+
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
+
+    def to_json(self) -> Dict[str, Any]:
+        def cell_json(cell: Any) -> Any:
+            return cell if isinstance(cell, str) else cell.to_json()
+
+        return {
+            "type": "table",
+            "alignment": self.alignment,
+            "header": [cell_json(c) for c in self.header],
+            "rows": [[cell_json(c) for c in row] for row in self.rows],
+            "caption": self.caption.to_json() if self.caption else None,
+        }
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class Heading:
-    def __init__(self, title: Content, level):
+    def __init__(self, title: Content, level: int, label: Optional[str] = None) -> None:
         self.title = title
         self.level = level
+        self.label = label
 
-    def to_latex(self, config: TexConfig):
-        content = self.title.to_latex(config)
-        if self.level == 1:
-            return config.apply_simple("heading1", content=content)
-        elif self.level == 2:
-            return config.apply_simple("heading2", content=content)
-        elif self.level == 3:
-            return config.apply_simple("heading3", content=content)
-        elif self.level == 4:
-            return config.apply_simple("heading4", content=content)
-        elif self.level == 5:
-            return config.apply_simple("heading5", content=content)
-        else:
-            return config.apply_simple("bold", content=content)
+    @property
+    def title_text(self) -> str:
+        """The title as plain, unescaped text."""
+        return self.title.plain_text().replace("\\_", "_")
+
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {
             "type": "heading",
             "title": self.title.to_json(),
             "level": self.level,
+            "label": self.label,
         }
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class OrderedList:
-    def __init__(self):
-        self.items = []
+    def __init__(self) -> None:
+        self.items: List[ListItem] = []
 
-    def add_item(self, item):
+    def add_item(self, item: "ListItem") -> None:
         self.items.append(item)
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple(
-            "ordered_list", items="\n".join([i.to_latex(config) for i in self.items])
-        )
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {"type": "ordered_list", "items": [i.to_json() for i in self.items]}
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class UnorderedList:
 
-    def __init__(self):
-        self.items = []
+    def __init__(self) -> None:
+        self.items: List[ListItem] = []
 
-    def add_item(self, item):
+    def add_item(self, item: "ListItem") -> None:
         self.items.append(item)
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple(
-            "unordered_list", items="\n".join([i.to_latex(config) for i in self.items])
-        )
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {"type": "unordered_list", "items": [i.to_json() for i in self.items]}
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class ListItem:
-    def __init__(self):
-        self.components = []
+    def __init__(self) -> None:
+        self.components: List[Any] = []
 
-    def add_component(self, component):
+    def add_component(self, component: Any) -> None:
         self.components.append(component)
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple(
-            "list_item", content="".join([c.to_latex(config) for c in self.components])
-        )
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {
             "type": "list_item",
             "components": [c.to_json() for c in self.components],
         }
 
 
+@mypyc_attr(allow_interpreted_subclasses=True)
 class SlideBreak:
     """Represents a slide break for presentations (---)"""
 
-    def __init__(self):
+    def __init__(self) -> None:
         pass
 
-    def to_latex(self, config: TexConfig):
-        return config.apply_simple("slide_break", content="")
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
 
-    def to_json(self):
+    def to_json(self) -> Dict[str, Any]:
         return {"type": "slide_break"}
+
+
+@mypyc_attr(allow_interpreted_subclasses=True)
+class Section:
+    """An entry in a document outline: a heading and the components it spans."""
+
+    def __init__(self, heading: Heading, document: Document, start: int) -> None:
+        self.heading = heading
+        self.document = document
+        self.start = start
+        self.end = len(document.components)
+        self.children: List[Section] = []
+        # The heading's document-wide label
+        self.label: Optional[str] = heading.label
+        # The (document, index) pairs leading from the root to the heading
+        self.chain: Chain = ((document, start),)
+
+    def _close(self, chain: Chain) -> None:
+        # End this section where the chain to the next heading passes
+        # through its document; otherwise it runs to the end of the file.
+        for document, index in chain:
+            if document is self.document:
+                self.end = index
+                return
+
+    @property
+    def title(self) -> str:
+        return self.heading.title_text
+
+    @property
+    def level(self) -> int:
+        return self.heading.level
+
+    @property
+    def components(self) -> List[Any]:
+        return self.document.components[self.start : self.end]
+
+    def matches(self, name: str) -> bool:
+        """Whether `name` is this section's title or label."""
+        return heading_matches(self.title, self.label, name)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "level": self.level,
+            "label": self.label,
+            "children": [c.to_json() for c in self.children],
+        }
+
+
+def heading_matches(title: str, label: Optional[str], name: str) -> bool:
+    """Whether a section path part names a heading by title or label."""
+    if name == title or name == label:
+        return True
+    return label is not None and label.partition(":")[2] == name
+
+
+@mypyc_attr(allow_interpreted_subclasses=True)
+class Include:
+    """An included Markdown file, rendered in place as a sub-document."""
+
+    def __init__(self, path: str, document: Document) -> None:
+        self.path = path
+        self.document = document
+
+    def to_latex(self, config: TexConfig) -> str:
+        return _render(self, config)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "type": "include",
+            "path": self.path,
+            "components": [c.to_json() for c in self.document.components],
+        }
+
+
+@mypyc_attr(allow_interpreted_subclasses=True)
+class LabelIndex:
+    """
+    The labels of a document and the files it includes, unique across them.
+
+    Labels are first made unique within each file while it is parsed. A file
+    may be included more than once, and its parsed document is shared by
+    every document that includes it, so the document-wide labels are kept
+    here rather than on the nodes: by scope, which numbers each occurrence
+    of a document in the include tree (0 for the root), and node.
+    """
+
+    def __init__(self, document: Optional[Document] = None) -> None:
+        self.labels: Dict[str, Any] = {}
+        # Labels without their "sec:"/"fig:"/"eq:" prefix -> full label
+        self.aliases: Dict[str, str] = {}
+        self._counts: Dict[str, int] = {}
+        self._scopes: Dict[Tuple[int, int], int] = {}
+        # The document of each scope
+        self._documents: List[Document] = []
+        self._node_labels: Dict[Tuple[int, int], str] = {}
+        if document is not None:
+            self._add_document(document, 0)
+
+    def _add_document(self, document: Document, scope: int) -> None:
+        self._documents.append(document)
+        bases = document._label_bases
+        for component in document._label_items:
+            if type(component) is Include:
+                child = len(self._documents)
+                self._scopes[(scope, id(component))] = child
+                self._add_document(component.document, child)
+            else:
+                label = bases.get(component.label, component.label)
+                unique = _unique_label(label, self.labels, self._counts)
+                self.labels[unique] = component
+                self._node_labels[(scope, id(component))] = unique
+                # Allow references without the prefix
+                _, sep, bare = unique.partition(":")
+                if sep:
+                    self.aliases.setdefault(bare, unique)
+
+    def child_scope(self, scope: int, include: "Include") -> int:
+        """The scope of an included document, included from `scope`."""
+        return self._scopes.get((scope, id(include)), -1)
+
+    def chain_scope(self, chain: Chain, scope: int = 0) -> int:
+        """The scope of the last document in a (document, index) chain."""
+        for document, index in chain[:-1]:
+            scope = self.child_scope(scope, document.components[index])
+        return scope
+
+    def label(self, scope: int, node: Any) -> Optional[str]:
+        """The document-wide label of a node in `scope`."""
+        label: Optional[str] = self._node_labels.get((scope, id(node)), node.label)
+        return label
+
+    def resolve(self, name: str, scope: Optional[int] = None) -> Optional[str]:
+        """
+        Return the full label for a reference target, or None if unknown.
+
+        With a scope, a label of the file the reference is in is preferred,
+        so a file included twice refers to its own headings in both copies.
+        """
+        if scope is not None and 0 <= scope < len(self._documents):
+            document = self._documents[scope]
+            local = document._label_aliases.get(name, name)
+            node = document._labels.get(local)
+            if node is not None:
+                return self.label(scope, node)
+        if name in self.labels:
+            return name
+        return self.aliases.get(name)
+
+
+def _unique_label(label: str, taken: Mapping[str, Any], counts: Dict[str, int]) -> str:
+    """Make a label unique with a -1, -2, ... suffix; updates `counts`."""
+    count = counts.get(label, 0)
+    unique = label if count == 0 else f"{label}-{count}"
+    while unique in taken:
+        count += 1
+        unique = f"{label}-{count}"
+    counts[label] = count + 1
+    return unique
+
+
+# Node types that can carry a label
+_LABELED_TYPES = {Heading, Image, FormulaBlock}
+
+# Label prefix and fallback slug for nodes labeled automatically
+_AUTO_LABELS: Dict[type, Tuple[str, str]] = {
+    Heading: ("sec", "section"),
+    Image: ("fig", "figure"),
+}
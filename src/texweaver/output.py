@@ -0,0 +1,88 @@
+import os
+import secrets
+import stat
+from typing import Callable, Optional, TextIO
+
+from .streams import compression_for_path, open_text_writer
+
+__all__ = ["CHUNK_SIZE", "write_if_changed"]
+
+# Read size used when comparing an existing file against new output
+CHUNK_SIZE = 1 << 16
+
+
+def write_if_changed(
+    path: str,
+    write: Callable[[TextIO], None],
+    encoding: str = "utf-8",
+    compression: Optional[str] = "auto",
+) -> bool:
+    """
+    Atomically write a text file, leaving it untouched if the content is the same.
+
+    The output is produced into a temporary file next to `path`. If an
+    existing file has identical content the temporary file is discarded, so
+    the existing file keeps its modification time and build tools such as
+    make or latexmk do not see a change. Otherwise the temporary file is
+    renamed over `path`, so readers never see a partially written file.
+
+    The output is compressed as it is written when `compression` names a
+    format ("gzip", "bz2", "xz", "lzma" or "zstd"); "auto" picks the format
+    from the extension of `path` (for example ".tex.gz").
+
+    Args:
+        path: Output file path
+        write: Callable that writes the content to the text stream it is given
+        encoding: Text encoding of the output file
+        compression: Compression format, "auto", or None for plain text
+
+    Returns:
+        True if the file was written, False if it was already up to date
+    """
+    if compression == "auto":
+        compression = compression_for_path(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(
+        directory, f".{os.path.basename(path)}.{secrets.token_hex(4)}.tmp"
+    )
+    # os.open applies the umask to the mode, like a normal open() would
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with open(fd, "wb") as raw:
+            with open_text_writer(raw, compression, encoding=encoding) as f:
+                write(f)
+
+        if _same_content(tmp_path, path):
+            os.unlink(tmp_path)
+            return False
+
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+        return True
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _same_content(new_path: str, old_path: str) -> bool:
+    """Compare two files by size, then chunk by chunk."""
+    try:
+        old_size = os.stat(old_path).st_size
+    except FileNotFoundError:
+        return False
+    if os.stat(new_path).st_size != old_size:
+        return False
+
+    with open(new_path, "rb") as new, open(old_path, "rb") as old:
+        while True:
+            new_chunk = new.read(CHUNK_SIZE)
+            if new_chunk != old.read(CHUNK_SIZE):
+                return False
+            if not new_chunk:
+                return True
@@ -0,0 +1,543 @@
+import io
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+from . import markdown as xwm
+from ._compiled import mypyc_attr
+from .sourcemap import SourceMap
+from .tex_config import TexConfig
+
+__all__ = [
+    "HEADING_KEYS",
+    "DEFAULT_PREAMBLE",
+    "Handler",
+    "Streamer",
+    "Visitor",
+    "LatexRenderer",
+]
+
+# Template key used for each heading level; deeper levels fall back to bold
+HEADING_KEYS = {
+    1: "heading1",
+    2: "heading2",
+    3: "heading3",
+    4: "heading4",
+    5: "heading5",
+}
+
+# Chunks a source map may hold before counting their lines
+_MAX_PENDING_CHUNKS = 1024
+
+# A handler renders one node: handler(visitor, node)
+Handler = Callable[[Any, Any], Any]
+# A streamer renders one node as a sequence of chunks
+Streamer = Callable[[Any, Any], Iterable[str]]
+
+DEFAULT_PREAMBLE = """\\documentclass{article}
+\\usepackage[utf8]{inputenc}
+\\usepackage[T1]{fontenc}
+\\usepackage{amsmath}
+\\usepackage{amsfonts}
+\\usepackage{amssymb}
+\\usepackage{graphicx}
+\\usepackage{float}
+\\usepackage{listings}
+\\usepackage{xcolor}"""
+
+
+@mypyc_attr(allow_interpreted_subclasses=True)
+class Visitor:
+    """
+    Base class for render backends.
+
+    Nodes are dispatched on their exact type through a table built once per
+    instance, so rendering does no per-node isinstance or if/elif checks.
+    Subclasses inherit a copy of their parent's handlers and can extend it
+    with the `handler` decorator:
+
+        @LatexRenderer.handler(MyNode)
+        def render_my_node(renderer, node):
+            return ...
+    """
+
+    handlers: ClassVar[Dict[type, Handler]] = {}
+    # Class-level tables that each subclass gets its own copy of
+    _class_tables: ClassVar[Tuple[str, ...]] = ("handlers",)
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        for name in cls._class_tables:
+            setattr(cls, name, dict(getattr(cls, name)))
+
+    @classmethod
+    def handler(cls, node_type: type) -> Callable[[Handler], Handler]:
+        """Register a handler for `node_type` on this class and its subclasses."""
+
+        def decorator(func: Handler) -> Handler:
+            cls.handlers[node_type] = func
+            return func
+
+        return decorator
+
+    def __init__(self) -> None:
+        self._dispatch: Dict[type, Handler] = dict(self.handlers)
+
+    def register(self, node_type: type, func: Handler) -> None:
+        """Register a handler for `node_type` on this instance only."""
+        self._dispatch[node_type] = func
+
+    def visit(self, node: Any) -> Any:
+        handler = self._dispatch.get(type(node))
+        if handler is None:
+            handler = self._resolve(type(node))
+        return handler(self, node)
+
+    def _resolve(self, node_type: type) -> Handler:
+        # Subclasses of known node types reuse their base handler; the result
+        # is cached so the MRO walk happens once per type.
+        for base in node_type.__mro__[1:]:
+            handler = self._dispatch.get(base)
+            if handler is not None:
+                break
+        else:
+            handler = type(self).generic_visit
+        self._dispatch[node_type] = handler
+        return handler
+
+    def generic_visit(self, node: Any) -> Any:
+        raise TypeError(f"No handler registered for {type(node).__name__}")
+
+
+@mypyc_attr(allow_interpreted_subclasses=True)
+class LatexRenderer(Visitor):
+    """
+    Render a Markdown document tree to LaTeX using a `TexConfig`.
+
+    Nodes with an entry in `streamers` are rendered as a sequence of chunks
+    by `iter_document`, so large nodes such as tables can be written to a
+    stream without building their whole output in memory. Registering a
+    handler for a node type drops its streamer, so that the handler is used
+    everywhere; add a streamer again after the handler to stream it.
+
+    If `source_map` is set to a `SourceMap`, rendering a document records
+    which Markdown lines each range of output lines came from.
+    """
+
+    streamers: ClassVar[Dict[type, Streamer]] = {}
+    _class_tables = ("handlers", "streamers")
+
+    def __init__(self, config: TexConfig) -> None:
+        super().__init__()
+        self.config = config
+        self._templates: Dict[str, Optional[str]] = {}
+        self._streamers: Dict[type, Streamer] = dict(self.streamers)
+        self.labels: Mapping[str, Any] = {}
+        self.label_aliases: Mapping[str, str] = {}
+        # Document-wide labels, and the scope of the document being rendered
+        self.label_index = xwm.LabelIndex()
+        self._scope = 0
+        # Reference targets that matched no label in the document
+        self.unresolved_references: List[str] = []
+        self.source_map: Optional[SourceMap] = None
+
+    @classmethod
+    def handler(cls, node_type: type) -> Callable[[Handler], Handler]:
+        """Register a handler for `node_type`, replacing its streamer."""
+
+        def decorator(func: Handler) -> Handler:
+            cls.handlers[node_type] = func
+            cls.streamers.pop(node_type, None)
+            return func
+
+        return decorator
+
+    def register(self, node_type: type, func: Handler) -> None:
+        """Register a handler on this instance only, replacing its streamer."""
+        self._streamers.pop(node_type, None)
+        super().register(node_type, func)
+
+    def apply(self, key: str, **kwargs: Any) -> str:
+        """Apply a template rule, caching the key lookup."""
+        try:
+            template = self._templates[key]
+        except KeyError:
+            template = self.config.lookup_simple(key)
+            self._templates[key] = template
+        if template is not None:
+            return template.format(**kwargs)
+        content: str = kwargs.get("content", "")
+        return content
+
+    def _has_template(self, key: str) -> bool:
+        if key not in self._templates:
+            self._templates[key] = self.config.lookup_simple(key)
+        return self._templates[key] is not None
+
+    def generic_visit(self, node: Any) -> Any:
+        # Nodes defined outside this package may render themselves
+        to_latex = getattr(node, "to_latex", None)
+        if to_latex is None:
+            return super().generic_visit(node)
+        return to_latex(self.config)
+
+    def render_document(self, document: "xwm.Document") -> str:
+        """Generate a complete LaTeX document."""
+        if self.source_map is not None:
+            out = io.StringIO()
+            self.write_document(document, out)
+            return out.getvalue()
+        return "".join(self.iter_document(document))
+
+    def write_document(self, document: "xwm.Document", out: TextIO) -> None:
+        """Write a complete LaTeX document to a text stream."""
+        write = out.write
+        if self.source_map is None:
+            for chunk in self.iter_document(document):
+                write(chunk)
+            return
+        # Chunks are handed to the map, which writes them out, joined, when
+        # it counts their lines; it does so every few chunks so that the
+        # output is not held in memory.
+        source_map = self.source_map
+        pending = source_map.pending
+        advance = pending.append
+        source_map.output = write
+        try:
+            for chunk in self.iter_document(document):
+                advance(chunk)
+                if len(pending) > _MAX_PENDING_CHUNKS:
+                    source_map.flush()
+            source_map.flush()
+        finally:
+            source_map.output = None
+
+    def iter_document(self, document: "xwm.Document") -> Iterator[str]:
+        """Generate a complete LaTeX document as a sequence of chunks."""
+        config = self.config
+        self.label_index, self._scope = document.label_scope()
+        self.labels = self.label_index.labels
+        self.label_aliases = self.label_index.aliases
+        # Get document structure from template
+        preamble = config.apply("document", "preamble", content="")
+        begin_document = config.apply("document", "begin_document", content="")
+        end_document = config.apply("document", "end_document", content="")
+
+        # If no document structure is defined, use fallback
+        if not preamble:
+            preamble = DEFAULT_PREAMBLE
+        if not begin_document:
+            begin_document = "\\begin{document}\n"
+        if not end_document:
+            end_document = "\\end{document}"
+
+        yield f"{preamble}\n{begin_document}\n"
+
+        # Check if this is a presentation template
+        if "beamer" in preamble.lower():
+            # For presentations, wrap content in frames
+            yield from self.iter_presentation(document)
+        else:
+            # Generate regular content
+            yield from self.iter_components(document.components, document)
+
+        yield "\n"
+        if self.source_map is not None:
+            self.source_map.mark(None)
+        yield end_document
+
+    def iter_node(self, node: Any) -> Iterator[str]:
+        streamer = self._streamers.get(type(node))
+        if streamer is None:
+            yield self.visit(node)
+        else:
+            yield from streamer(self, node)
+
+    def iter_components(
+        self, components: List[Any], document: Optional["xwm.Document"] = None
+    ) -> Iterator[str]:
+        """
+        Render components separated by blank lines.
+
+        `document` is the document the components belong to; it is needed to
+        record source lines when a source map is being built.
+        """
+        iter_node = self.iter_node
+        mark = self.source_map.mark if self.source_map is not None else None
+        if document is None:
+            mark = None
+        separator = ""
+        for index, component in enumerate(components):
+            yield separator
+            if mark is not None:
+                mark(document, index)
+            yield from iter_node(component)
+            separator = "\n"
+
+    def render_components(self, components: List[Any]) -> str:
+        visit = self.visit
+        return "\n".join([visit(c) for c in components])
+
+    def iter_presentation(self, document: "xwm.Document") -> Iterator[str]:
+        """Generate content for Beamer presentations with proper frame structure."""
+        # Split the flattened component stream into slides in one pass
+        # Slides hold (document, index, component, label scope) entries
+        slides: List[List[Tuple[xwm.Document, int, Any, int]]] = [[]]
+        base_scope = self._scope
+        for entry in self._iter_scoped(document, base_scope):
+            if type(entry[2]) is xwm.SlideBreak:
+                slides.append([])
+            else:
+                slides[-1].append(entry)
+
+        iter_node = self.iter_node
+        mark = self.source_map.mark if self.source_map is not None else None
+        separator = ""
+        for index, slide in enumerate(slides):
+            # The first frame only opens once it has content; every slide
+            # break opens a new frame.
+            if index == 0 and not slide:
+                continue
+            if index > 0 and (index > 1 or slides[0]):
+                yield separator
+                if mark is not None:
+                    # Frame markup maps to no source
+                    mark(None)
+                yield "\\end{frame}\n"
+                separator = "\n"
+            yield separator
+            if mark is not None:
+                mark(None)
+            if any(type(entry[2]) is xwm.CodeBlock for entry in slide):
+                yield "\\begin{frame}[fragile]"
+            else:
+                yield "\\begin{frame}"
+            separator = "\n"
+            for source, position, component, scope in slide:
+                yield separator
+                if mark is not None:
+                    mark(source, position)
+                self._scope = scope
+                yield from iter_node(component)
+
+        self._scope = base_scope
+
+        # Close the last frame if needed
+        if separator:
+            yield "\n"
+            if mark is not None:
+                mark(None)
+            yield "\\end{frame}"
+
+    def _iter_scoped(
+        self, document: "xwm.Document", scope: int
+    ) -> Iterator[Tuple["xwm.Document", int, Any, int]]:
+        # Like Document.iter_indexed, with the label scope of each component
+        for index, component in enumerate(document.components):
+            if isinstance(component, xwm.Include):
+                child = self.label_index.child_scope(scope, component)
+                yield from self._iter_scoped(component.document, child)
+            else:
+                yield document, index, component, scope
+
+    def label_of(self, node: Any) -> Optional[str]:
+        """
+        The document-wide label of a node of the document being rendered.
+
+        A heading or image rendered on its own, outside a document, gets its
+        automatic label.
+        """
+        label = self.label_index.label(self._scope, node)
+        if label is None:
+            label = xwm.auto_label(node)
+        return label
+
+    def render_presentation(self, document: "xwm.Document") -> str:
+        return "".join(self.iter_presentation(document))
+
+    def render_content(self, node: "xwm.Content") -> str:
+        visit = self.visit
+        return "".join([visit(c) for c in node.components])
+
+    def render_text(self, node: "xwm.Text") -> str:
+        return self.apply("text", content=node.text)
+
+    def render_bold(self, node: "xwm.InlineBold") -> str:
+        return self.apply("bold", content=node.text)
+
+    def render_italic(self, node: "xwm.InlineItalic") -> str:
+        return self.apply("italic", content=node.text)
+
+    def render_inline_code(self, node: "xwm.InlineCode") -> str:
+        return self.apply("inline_code", content=node.text)
+
+    def render_inline_formula(self, node: "xwm.InlineFormula") -> str:
+        return self.apply("inline_formula", content=node.text)
+
+    def render_paragraph(self, node: "xwm.Paragraph") -> str:
+        return self.apply("paragraph", content=self.render_content(node.content))
+
+    def render_formula_block(self, node: "xwm.FormulaBlock") -> str:
+        # Only numbered environments can be referenced
+        label = self.label_of(node)
+        if label is not None and self._has_template("block_formula_labeled"):
+            return self.apply("block_formula_labeled", content=node.text, label=label)
+        return self.apply("block_formula", content=node.text)
+
+    def render_reference(self, node: "xwm.Reference") -> str:
+        label = node.label
+        resolved = self.label_index.resolve(label, self._scope)
+        if resolved is None:
+            self.unresolved_references.append(label)
+        else:
+            label = resolved
+        if self._has_template("internal_ref"):
+            ref = self.apply("internal_ref", label=label)
+        else:
+            ref = f"\\ref{{{label}}}"
+        return f"{node.text}~{ref}" if node.text else ref
+
+    def render_code_block(self, node: "xwm.CodeBlock") -> str:
+        return self.apply("code_block", code="\n".join(node.code), lang=node.lang)
+
+    def render_image(self, node: "xwm.Image") -> str:
+        caption_text = self.render_content(node.caption)
+        src = node.path if node.resolved_path is None else node.resolved_path
+        return self.apply(
+            "image", src=src, alt=caption_text, width="0.8", label=self.label_of(node)
+        )
+
+    def render_heading(self, node: "xwm.Heading") -> str:
+        content = self.render_content(node.title)
+        return self.apply(
+            HEADING_KEYS.get(node.level, "bold"),
+            content=content,
+            label=self.label_of(node),
+        )
+
+    def render_ordered_list(self, node: "xwm.OrderedList") -> str:
+        visit = self.visit
+        return self.apply(
+            "ordered_list", items="\n".join([visit(i) for i in node.items])
+        )
+
+    def render_unordered_list(self, node: "xwm.UnorderedList") -> str:
+        visit = self.visit
+        return self.apply(
+            "unordered_list", items="\n".join([visit(i) for i in node.items])
+        )
+
+    def render_list_item(self, node: "xwm.ListItem") -> str:
+        visit = self.visit
+        return self.apply(
+            "list_item", content="".join([visit(c) for c in node.components])
+        )
+
+    def render_slide_break(self, node: "xwm.SlideBreak") -> str:
+        return self.apply("slide_break", content="")
+
+    def render_include(self, node: "xwm.Include") -> str:
+        parent = self._scope
+        self._scope = self.label_index.child_scope(parent, node)
+        try:
+            return self.render_components(node.document.components)
+        finally:
+            self._scope = parent
+
+    def iter_include(self, node: "xwm.Include") -> Iterator[str]:
+        # Nodes of the included document are labeled in its own scope
+        parent = self._scope
+        self._scope = self.label_index.child_scope(parent, node)
+        try:
+            yield from self.iter_components(node.document.components, node.document)
+        finally:
+            self._scope = parent
+
+    def render_table(self, node: "xwm.Table") -> str:
+        return "".join(self.iter_table(node))
+
+    def iter_table(self, node: "xwm.Table") -> Iterator[str]:
+        """Render a table row by row."""
+        apply = self.apply
+        render_content = self.render_content
+
+        # Long tables use longtable, if the template provides it
+        min_rows = self.config.lookup_simple("longtable_min_rows")
+        is_long = (
+            min_rows is not None
+            and len(node.rows) >= int(min_rows)
+            and self.config.lookup_simple("longtable_begin") is not None
+        )
+        prefix = "longtable_" if is_long else "table_"
+        header_key = "table_header_row"
+        if is_long and self.config.lookup_simple("longtable_header_row") is not None:
+            header_key = "longtable_header_row"
+
+        caption = render_content(node.caption) if node.caption is not None else ""
+        yield apply(prefix + "begin", alignment=node.alignment)
+
+        cells = " & ".join(
+            [
+                apply(
+                    "table_header_cell",
+                    content=c if type(c) is str else render_content(c),
+                )
+                for c in node.header
+            ]
+        )
+        yield apply(header_key, cells=cells) + "\n"
+
+        for row in node.rows:
+            cells = " & ".join(
+                [
+                    apply(
+                        "table_cell",
+                        content=c if type(c) is str else render_content(c),
+                    )
+                    for c in row
+                ]
+            )
+            yield apply("table_row", cells=cells) + "\n"
+
+        yield apply(prefix + "end", caption=caption)
+
+
+LatexRenderer.handlers.update(
+    {
+        xwm.Content: LatexRenderer.render_content,
+        xwm.Text: LatexRenderer.render_text,
+        xwm.InlineBold: LatexRenderer.render_bold,
+        xwm.InlineItalic: LatexRenderer.render_italic,
+        xwm.InlineCode: LatexRenderer.render_inline_code,
+        xwm.InlineFormula: LatexRenderer.render_inline_formula,
+        xwm.Paragraph: LatexRenderer.render_paragraph,
+        xwm.FormulaBlock: LatexRenderer.render_formula_block,
+        xwm.Reference: LatexRenderer.render_reference,
+        xwm.CodeBlock: LatexRenderer.render_code_block,
+        xwm.Image: LatexRenderer.render_image,
+        xwm.Heading: LatexRenderer.render_heading,
+        xwm.OrderedList: LatexRenderer.render_ordered_list,
+        xwm.UnorderedList: LatexRenderer.render_unordered_list,
+        xwm.ListItem: LatexRenderer.render_list_item,
+        xwm.SlideBreak: LatexRenderer.render_slide_break,
+        xwm.Include: LatexRenderer.render_include,
+        xwm.Table: LatexRenderer.render_table,
+    }
+)
+
+LatexRenderer.streamers.update(
+    {
+        xwm.Include: LatexRenderer.iter_include,
+        xwm.Table: LatexRenderer.iter_table,
+    }
+)
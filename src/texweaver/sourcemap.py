@@ -0,0 +1,246 @@
+import json
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, repeat
+from operator import sub
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, TextIO, Tuple
+
+from . import markdown as xwm
+from .streams import split_compression_suffix
+
+__all__ = ["SOURCE_MAP_VERSION", "SourceRange", "SourceMap", "source_map_path"]
+
+SOURCE_MAP_VERSION = 1
+
+
+class SourceRange(NamedTuple):
+    """A range of lines in a Markdown source file."""
+
+    source: str
+    start: int
+    end: int
+
+    def __str__(self) -> str:
+        if self.start == self.end:
+            return f"{self.source}:{self.start}"
+        return f"{self.source}:{self.start}-{self.end}"
+
+
+class SourceMap:
+    """
+    Map lines of generated LaTeX back to the Markdown lines they came from.
+
+    Set a SourceMap as `LatexRenderer.source_map` before rendering. The
+    renderer hands the map every chunk it writes and marks where each
+    component's output starts. Marking only counts the lines of the chunks
+    since the previous mark, in one pass, and appends to two arrays; the
+    entries, parallel arrays sorted by output line, are built from the marks
+    when the map is first read (`lookup`, `len`, `to_json`):
+
+        renderer.source_map = SourceMap()
+        renderer.write_document(document, out)
+        renderer.source_map.lookup(48213)  # SourceRange("book.md", 1234, 1236)
+
+    A source range runs from a component's first line up to the line before
+    the next component, so it may include trailing blank lines.
+    """
+
+    def __init__(self) -> None:
+        self.sources: List[str] = []
+        self._source_ids: Dict[str, int] = {}
+        self.output_starts = array("L")
+        self.output_ends = array("L")
+        self.source_ids = array("L")
+        self.source_starts = array("L")
+        self.source_ends = array("L")
+        # Output line the pending chunks start on, and the number of chunks
+        # before them
+        self.line = 1
+        self._chunk_count = 0
+        # Chunks written since their lines were last counted
+        self.pending: List[str] = []
+        # If set, pending chunks are passed to it, joined, when they are
+        # counted, so a renderer writes a few large strings
+        self.output: Optional[Callable[[str], Any]] = None
+        # Output line and component index of every mark not yet made an
+        # entry, and (first mark, document) wherever the document changes;
+        # typed arrays keep marking free of per-component objects. Marks
+        # from `_counted` on hold the number of chunks before them instead
+        # of a line, until the pending chunks are counted.
+        self._mark_lines = array("L")
+        self._counted = 0
+        self._mark_indexes = array("L")
+        self._mark_documents: List[Tuple[int, Optional["xwm.Document"]]] = [(0, None)]
+        self._document: Optional["xwm.Document"] = None
+
+    def advance(self, chunk: str) -> None:
+        """Account for a chunk of output."""
+        self.pending.append(chunk)
+
+    def flush(self) -> int:
+        """Count the lines of the pending chunks; returns the current line."""
+        marks = self._mark_lines
+        pending = self.pending
+        counted = self._counted
+        if counted < len(marks):
+            # Look up the line each new mark is on in the lines the pending
+            # chunks start on, all without a Python call per chunk or mark
+            lines = list(
+                accumulate(map(str.count, pending, repeat("\n")), initial=self.line)
+            )
+            offsets = map(sub, marks[counted:], repeat(self._chunk_count))
+            marks[counted:] = array("L", map(lines.__getitem__, offsets))
+            self._counted = len(marks)
+        if pending:
+            text = "".join(pending)
+            if self.output is not None:
+                self.output(text)
+            self.line += text.count("\n")
+            self._chunk_count += len(pending)
+            pending.clear()
+        return self.line
+
+    def mark(self, document: Optional["xwm.Document"], index: int = 0) -> None:
+        """
+        Start an entry for component `index` of `document` at the current line.
+
+        With no document, the current entry is closed and the output that
+        follows maps to no source. Only the number of chunks so far is
+        recorded; it is turned into a line when the chunks are counted.
+        """
+        if document is not self._document:
+            self._document = document
+            self._mark_documents.append((len(self._mark_lines), document))
+        self._mark_lines.append(self._chunk_count + len(self.pending))
+        self._mark_indexes.append(index)
+
+    def _finish(self) -> None:
+        """Turn every mark but the last, which is still open, into entries."""
+        self.flush()
+        lines = self._mark_lines
+        indexes = self._mark_indexes
+        runs = self._mark_documents
+        count = len(lines)
+        if count < 2:
+            return
+        add_output_start = self.output_starts.append
+        add_output_end = self.output_ends.append
+        add_source_id = self.source_ids.append
+        add_source_start = self.source_starts.append
+        add_source_end = self.source_ends.append
+        for run, (first, document) in enumerate(runs):
+            if document is None:
+                continue
+            last = runs[run + 1][0] if run + 1 < len(runs) else count - 1
+            source_lines = document.source_lines
+            line_count = document.line_count
+            size = len(source_lines)
+            source_id = -1
+            for line, next_line, index in zip(
+                lines[first:last], lines[first + 1 : last + 1], indexes[first:last]
+            ):
+                if next_line <= line:
+                    # The component produced no lines of its own
+                    continue
+                start = source_lines[index] if index < size else 0
+                if not start:
+                    continue
+                end = source_lines[index + 1] - 1 if index + 1 < size else 0
+                if end < start:
+                    end = max(start, line_count)
+                if source_id < 0:
+                    source_id = self._source_id(document.source_path or "<string>")
+                add_output_start(line)
+                add_output_end(next_line - 1)
+                add_source_id(source_id)
+                add_source_start(start)
+                add_source_end(end)
+
+        # Keep the last mark, whose entry ends at the next one
+        self._mark_lines = lines[-1:]
+        self._mark_indexes = indexes[-1:]
+        self._counted = 1
+        self._mark_documents = [(0, runs[-1][1])]
+
+    def _source_id(self, source: str) -> int:
+        source_id = self._source_ids.get(source)
+        if source_id is None:
+            source_id = self._source_ids[source] = len(self.sources)
+            self.sources.append(source)
+        return source_id
+
+    def __len__(self) -> int:
+        self._finish()
+        return len(self.output_ends)
+
+    def lookup(self, line: int) -> Optional[SourceRange]:
+        """The source lines that produced output `line`, or None."""
+        self._finish()
+        index = bisect_right(self.output_starts, line) - 1
+        if index < 0 or index >= len(self.output_ends):
+            return None
+        if line > self.output_ends[index]:
+            return None
+        return SourceRange(
+            self.sources[self.source_ids[index]],
+            self.source_starts[index],
+            self.source_ends[index],
+        )
+
+    def to_json(self) -> dict:
+        """
+        The map as JSON data.
+
+        Each mapping is [output_start, output_end, source, start, end], where
+        `source` indexes `sources` and all line numbers are 1-based and
+        inclusive.
+        """
+        self._finish()
+        return {
+            "version": SOURCE_MAP_VERSION,
+            "sources": list(self.sources),
+            "mappings": [
+                list(entry)
+                for entry in zip(
+                    self.output_starts,
+                    self.output_ends,
+                    self.source_ids,
+                    self.source_starts,
+                    self.source_ends,
+                )
+            ],
+        }
+
+    @classmethod
+    def from_json(cls, obj: dict) -> "SourceMap":
+        if obj.get("version") != SOURCE_MAP_VERSION:
+            raise ValueError(f"Unsupported source map version {obj.get('version')}")
+        source_map = cls()
+        source_map.sources = list(obj["sources"])
+        source_map._source_ids = {s: i for i, s in enumerate(source_map.sources)}
+        for entry in obj["mappings"]:
+            source_map.output_starts.append(entry[0])
+            source_map.output_ends.append(entry[1])
+            source_map.source_ids.append(entry[2])
+            source_map.source_starts.append(entry[3])
+            source_map.source_ends.append(entry[4])
+        return source_map
+
+    def write(self, out: TextIO) -> None:
+        """Write the map as JSON, one mapping per line."""
+        data = self.to_json()
+        mappings = data.pop("mappings")
+        out.write(json.dumps(data)[:-1])
+        out.write(', "mappings": [\n')
+        out.write(",\n".join([json.dumps(m) for m in mappings]))
+        out.write("\n]}\n")
+
+    @classmethod
+    def load(cls, path: str) -> "SourceMap":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_json(json.load(f))
+
+
+def source_map_path(output_file: str) -> str:
+    """The source map file for an output file: "book.tex.gz" -> "book.tex.map"."""
+    return split_compression_suffix(output_file)[0] + ".map"
@@ -0,0 +1,181 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+from typing import BinaryIO, Iterator, Optional, TextIO, Tuple, cast
+
+from .limits import ParseLimitError
+
+__all__ = [
+    "COMPRESSION_EXTENSIONS",
+    "split_compression_suffix",
+    "compression_for_path",
+    "detect_compression",
+    "open_text_reader",
+    "read_lines",
+    "open_text_writer",
+]
+
+# zstd is in the standard library from Python 3.14, otherwise optional
+try:
+    from compression import zstd as _zstd  # type: ignore
+except ImportError:
+    _zstd = None
+try:
+    import zstandard as _zstandard  # type: ignore
+except ImportError:
+    _zstandard = None
+
+# File extension -> compression format
+COMPRESSION_EXTENSIONS = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".lzma": "lzma",
+    ".zst": "zstd",
+}
+
+# Leading bytes that identify a compressed file
+_MAGIC = (
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+
+
+def split_compression_suffix(path: str) -> Tuple[str, str]:
+    """Split a compression extension off a path: "a.md.gz" -> ("a.md", ".gz")."""
+    base, ext = os.path.splitext(path)
+    if ext.lower() in COMPRESSION_EXTENSIONS:
+        return base, ext
+    return path, ""
+
+
+def compression_for_path(path: str) -> Optional[str]:
+    """The compression format implied by a file's extension, or None."""
+    return COMPRESSION_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """
+    Detect the compression format of an existing file.
+
+    The file's leading bytes are checked first; the extension is only used
+    for legacy .lzma files, which have no reliable magic number.
+    """
+    with open(path, "rb") as f:
+        head = f.read(6)
+    for magic, compression in _MAGIC:
+        if head.startswith(magic):
+            return compression
+    if compression_for_path(path) == "lzma":
+        return "lzma"
+    return None
+
+
+def open_text_reader(path: str, encoding: str = "utf-8") -> TextIO:
+    """Open a file for reading text, decompressing it on the fly if needed."""
+    compression = detect_compression(path)
+    if compression is None:
+        return open(path, "r", encoding=encoding)
+    if compression == "gzip":
+        return gzip.open(path, "rt", encoding=encoding)
+    if compression == "bz2":
+        return bz2.open(path, "rt", encoding=encoding)
+    if compression in ("xz", "lzma"):
+        return lzma.open(path, "rt", encoding=encoding)
+    if _zstd is not None:
+        return cast(TextIO, _zstd.open(path, "rt", encoding=encoding))
+    if _zstandard is not None:
+        return cast(TextIO, _zstandard.open(path, "rt", encoding=encoding))
+    raise ValueError(_ZSTD_MISSING)
+
+
+def read_lines(f: TextIO, max_line_length: Optional[int] = None) -> Iterator[str]:
+    """
+    Iterate over the lines of a text stream, without line terminators.
+
+    With `max_line_length`, no more than that many characters (plus one) are
+    read for a line, so an overlong line raises ParseLimitError instead of
+    being read into memory whole (as it would be from /dev/zero).
+    """
+    if max_line_length is None:
+        for line in f:
+            yield line.rstrip("\n")
+        return
+    line_number = 0
+    while True:
+        line = f.readline(max_line_length + 1)
+        if not line:
+            return
+        line_number += 1
+        line = line.rstrip("\n")
+        if len(line) > max_line_length:
+            raise ParseLimitError(
+                f"line is longer than the limit of {max_line_length} characters",
+                line_number,
+            )
+        yield line
+
+
+def open_text_writer(
+    raw: BinaryIO, compression: Optional[str], encoding: str = "utf-8"
+) -> TextIO:
+    """
+    Wrap a binary file for writing text, compressing it as it is written.
+
+    Closing the returned stream finishes the compressed data but leaves `raw`
+    open. Compressed output is deterministic (gzip headers carry no
+    timestamp), so identical content produces identical files.
+    """
+    buffer: io.BufferedIOBase
+    if compression is None:
+        buffer = _Unclosable(raw)
+    else:
+        buffer = _compressor(raw, compression)
+    return io.TextIOWrapper(cast(BinaryIO, buffer), encoding=encoding)
+
+
+def _compressor(raw: BinaryIO, compression: str) -> io.BufferedIOBase:
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="wb", mtime=0, filename="")
+    if compression == "bz2":
+        return bz2.BZ2File(raw, "wb")
+    if compression == "xz":
+        return lzma.LZMAFile(raw, "wb", format=lzma.FORMAT_XZ)
+    if compression == "lzma":
+        return lzma.LZMAFile(raw, "wb", format=lzma.FORMAT_ALONE)
+    if compression == "zstd":
+        if _zstd is not None:
+            return cast(io.BufferedIOBase, _zstd.ZstdFile(raw, "wb"))
+        if _zstandard is not None:
+            writer = _zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+            return cast(io.BufferedIOBase, writer)
+        raise ValueError(_ZSTD_MISSING)
+    raise ValueError(f"Unknown compression format '{compression}'")
+
+
+_ZSTD_MISSING = "zstd compression requires Python 3.14+ or the 'zstandard' package"
+
+
+class _Unclosable(io.BufferedIOBase):
+    """A writable stream that flushes, but does not close, the underlying file."""
+
+    def __init__(self, raw: BinaryIO) -> None:
+        self._raw = raw
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: bytes) -> int:  # type: ignore[override]
+        return self._raw.write(b)
+
+    def flush(self) -> None:
+        self._raw.flush()
+
+    def close(self) -> None:
+        if not self.closed:
+            self._raw.flush()
+            super().close()
@@ -1,17 +1,37 @@
+import copy
 import importlib.resources as pkg_resources
 import os
+import threading
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional, List, Tuple
 
 import yaml
 
+from ._compiled import mypyc_attr
 
+__all__ = [
+    "TemplateError",
+    "TexConfig",
+    "FrozenTexConfig",
+    "load_template_file",
+    "clear_template_cache",
+    "get_default_config",
+    "DefaultConfig",
+]
+
+
+class TemplateError(Exception):
+    """Raised when a template file or its `extends` chain cannot be loaded."""
+
+
+@mypyc_attr(allow_interpreted_subclasses=True)
 class TexConfig:
     """LaTeX template configuration manager."""
 
     def __init__(
         self, template_name: str = "default", config_file: Optional[str] = None
-    ):
+    ) -> None:
         """
         Initialize the TeX configuration.
 
@@ -19,7 +39,7 @@ class TexConfig:
             template_name: Name of the built-in template to use
             config_file: Path to custom configuration file
         """
-        self.config: Dict[str, Any] = {}
+        self.config: Mapping[str, Any] = {}
         self.template_name = template_name
 
         if config_file is not None:
@@ -28,25 +48,24 @@ class TexConfig:
             self.load_template(template_name)
 
     def load_from_file(self, config_file: str) -> None:
-        """Load configuration from a file."""
-        with open(config_file, "r", encoding="utf-8") as f:
-            self.config = yaml.safe_load(f)
+        """
+        Load configuration from a file.
+
+        The file may name a built-in template or another file with
+        `extends:`; see `load_template_file`.
+        """
+        self.config = load_template_file(config_file)
 
     def load_template(self, template_name: str) -> None:
         """Load a built-in template."""
         try:
-            # Use the new traversable API for accessing subdirectories
-            templates_path = pkg_resources.files("texweaver") / "templates"
-            template_file = templates_path / f"{template_name}.yaml"
-
-            if template_file.exists():
-                with template_file.open(encoding="utf-8") as f:
-                    self.config = yaml.safe_load(f)
-            else:
+            template_file = _builtin_template_path(template_name)
+            if template_file is None:
                 # Fallback to default template
-                default_file = templates_path / "default.yaml"
-                with default_file.open(encoding="utf-8") as f:
-                    self.config = yaml.safe_load(f)
+                template_file = _builtin_template_path("default")
+            if template_file is None:
+                raise TemplateError("The default template is missing")
+            self.config = load_template_file(template_file)
 
         except Exception as e:
             # Ultimate fallback - create a minimal config
@@ -89,10 +108,10 @@ class TexConfig:
         templates = []
         try:
             templates_path = pkg_resources.files("texweaver") / "templates"
-            if templates_path.exists():
+            if templates_path.is_dir():
                 for template_file in templates_path.iterdir():
-                    if template_file.suffix == ".yaml":
-                        templates.append(template_file.stem)
+                    if template_file.name.endswith(".yaml"):
+                        templates.append(template_file.name[: -len(".yaml")])
         except Exception:
             # Fallback list if directory reading fails
             templates = ["default", "academic", "book", "presentation"]
@@ -107,7 +126,7 @@ class TexConfig:
             "version": self.config.get("version", "1.0"),
         }
 
-    def apply(self, category: str, key: str, **kwargs) -> str:
+    def apply(self, category: str, key: str, **kwargs: Any) -> str:
         """
         Apply a template rule.
 
@@ -121,7 +140,7 @@ class TexConfig:
         """
         # Try category.key first
         if category in self.config and key in self.config[category]:
-            template = self.config[category][key]
+            template: str = self.config[category][key]
             return template.format(**kwargs)
 
         # Try direct key lookup for backward compatibility
@@ -131,11 +150,12 @@ class TexConfig:
 
         # Fallback
         if "content" in kwargs:
-            return kwargs["content"]
+            content: str = kwargs["content"]
+            return content
         else:
             return ""
 
-    def apply_simple(self, key: str, **kwargs) -> str:
+    def apply_simple(self, key: str, **kwargs: Any) -> str:
         """
         Apply a template rule using simple key lookup (backward compatibility).
 
@@ -146,29 +166,228 @@ class TexConfig:
         Returns:
             Formatted LaTeX string
         """
+        template: Optional[str] = self.lookup_simple(key)
+        if template is not None:
+            return template.format(**kwargs)
+
+        # Fallback
+        if "content" in kwargs:
+            content: str = kwargs["content"]
+            return content
+        else:
+            return ""
+
+    def lookup_simple(self, key: str) -> Any:
+        """
+        Find the raw template string for a key without applying it.
+
+        Args:
+            key: Template key
+
+        Returns:
+            The template string (or other configured value, such as a
+            number), or None if no category defines the key
+        """
         # Search through all categories
         for category_name, category_content in self.config.items():
             if isinstance(category_content, dict) and key in category_content:
-                template = category_content[key]
-                return template.format(**kwargs)
+                return category_content[key]
 
         # Direct lookup
         if key in self.config:
-            template = self.config[key]
-            return template.format(**kwargs)
+            return self.config[key]
 
-        # Fallback
-        if "content" in kwargs:
-            return kwargs["content"]
+        return None
+
+    def freeze(self) -> "FrozenTexConfig":
+        """Return a read-only snapshot of this configuration."""
+        return FrozenTexConfig(self)
+
+
+@mypyc_attr(allow_interpreted_subclasses=True)
+class FrozenTexConfig(TexConfig):
+    """
+    Read-only snapshot of a TexConfig.
+
+    The configuration is deep-copied and frozen, and simple key lookups are
+    precomputed, so a frozen config can be shared between threads and later
+    changes to the original config do not affect it.
+    """
+
+    def __init__(self, config: TexConfig) -> None:
+        """
+        Args:
+            config: Configuration to take a snapshot of
+        """
+        self.template_name = config.template_name
+        self.config = _freeze(copy.deepcopy(config.config))
+
+        # Same precedence as TexConfig.lookup_simple: categories in order,
+        # then top-level keys
+        simple: Dict[str, Any] = {}
+        for category_content in self.config.values():
+            if isinstance(category_content, MappingProxyType):
+                for key, template in category_content.items():
+                    simple.setdefault(key, template)
+        for key, template in self.config.items():
+            simple.setdefault(key, template)
+        self._simple = simple
+
+    def load_from_file(self, config_file: str) -> None:
+        raise TypeError("FrozenTexConfig is read-only")
+
+    def load_template(self, template_name: str) -> None:
+        raise TypeError("FrozenTexConfig is read-only")
+
+    def lookup_simple(self, key: str) -> Any:
+        return self._simple.get(key)
+
+    def freeze(self) -> "FrozenTexConfig":
+        return self
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively turn dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+# (path, mtime_ns, size) of a template file
+_Stamp = Tuple[str, int, int]
+
+_cache_lock = threading.Lock()
+# Parsed template files by path, with the stamp they were parsed at
+_parsed_files: Dict[str, Tuple[_Stamp, Dict[str, Any]]] = {}
+# Flattened configurations by the stamps of their extends chain, leaf first
+_merged_configs: Dict[Tuple[_Stamp, ...], Dict[str, Any]] = {}
+# Most recent extends chain of each template file
+_chains: Dict[str, Tuple[_Stamp, ...]] = {}
+
+
+def load_template_file(path: str) -> Dict[str, Any]:
+    """
+    Load a template file, layered over the template it extends.
+
+    A template may start with `extends: <name>`, naming a built-in template
+    (`extends: default`) or another file, relative to this one
+    (`extends: base.yaml`). Its categories are merged rule by rule over the
+    base's, other values replace the base's, and a rule set to null is
+    removed. Chains of any length are allowed; cycles raise TemplateError.
+
+    The flattened configuration is cached, keyed by the chain's file paths
+    and modification times, so loading the same template again only stats
+    its files. A fresh copy is returned on every call.
+    """
+    _, merged = _load_chain(os.path.realpath(path), [])
+    return copy.deepcopy(merged)
+
+
+def clear_template_cache() -> None:
+    """Forget all parsed and merged template files."""
+    with _cache_lock:
+        _parsed_files.clear()
+        _merged_configs.clear()
+        _chains.clear()
+
+
+def _load_chain(
+    key: str, stack: List[str]
+) -> Tuple[Tuple[_Stamp, ...], Dict[str, Any]]:
+    """Return the extends chain of a template file and its merged config."""
+    if key in stack:
+        cycle = stack[stack.index(key) :] + [key]
+        raise TemplateError("Template extends cycle: " + " -> ".join(cycle))
+
+    with _cache_lock:
+        cached_chain = _chains.get(key)
+        cached = _merged_configs.get(cached_chain) if cached_chain else None
+    if cached is not None and cached_chain is not None:
+        if all(_stamp(stamp[0]) == stamp for stamp in cached_chain):
+            return cached_chain, cached
+
+    stamp, data = _parse_template_file(key)
+    base_name = data.get("extends")
+    if base_name is None:
+        chain: Tuple[_Stamp, ...] = (stamp,)
+        merged = data
+    else:
+        base_path = _resolve_base(str(base_name), os.path.dirname(key))
+        base_chain, base = _load_chain(base_path, stack + [key])
+        chain = (stamp,) + base_chain
+        merged = _merge(base, {k: v for k, v in data.items() if k != "extends"})
+
+    with _cache_lock:
+        if cached_chain is not None:
+            _merged_configs.pop(cached_chain, None)
+        _chains[key] = chain
+        _merged_configs[chain] = merged
+    return chain, merged
+
+
+def _parse_template_file(key: str) -> Tuple[_Stamp, Dict[str, Any]]:
+    """Parse a template file, reusing the cached parse if it is unchanged."""
+    stamp = _stamp(key)
+    with _cache_lock:
+        cached = _parsed_files.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached
+
+    with open(key, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise TemplateError(f"Template '{key}' is not a mapping")
+    with _cache_lock:
+        _parsed_files[key] = (stamp, data)
+    return stamp, data
+
+
+def _resolve_base(name: str, directory: str) -> str:
+    """Find the file named by `extends`: a built-in template or a path."""
+    if name.endswith((".yaml", ".yml")) or "/" in name or os.sep in name:
+        return os.path.realpath(os.path.join(directory, os.path.expanduser(name)))
+    path = _builtin_template_path(name)
+    if path is None:
+        raise TemplateError(f"Unknown base template '{name}'")
+    return path
+
+
+def _builtin_template_path(template_name: str) -> Optional[str]:
+    """Path of a built-in template file, or None if there is no such template."""
+    templates_path = pkg_resources.files("texweaver") / "templates"
+    template_file = templates_path / f"{template_name}.yaml"
+    if not template_file.is_file():
+        return None
+    return os.path.realpath(str(template_file))
+
+
+def _stamp(path: str) -> _Stamp:
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge `override` over `base`, recursing into nested mappings."""
+    merged = dict(base)
+    for key, value in override.items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
         else:
-            return ""
+            merged[key] = value
+    return merged
 
 
 # Create default configuration instance (delayed initialization)
-_default_config = None
+_default_config: Optional[TexConfig] = None
 
 
-def get_default_config():
+def get_default_config() -> TexConfig:
     """Get the default configuration instance."""
     global _default_config
     if _default_config is None:
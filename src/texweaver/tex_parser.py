@@ -1,43 +1,234 @@
+import os
 import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 from . import markdown as xwm
+from ._compiled import mypyc_attr
+from .includes import IncludeResolver
+from .limits import ParseLimitError, ParserLimits
 from .tex_config import DefaultConfig, TexConfig
 
+__all__ = ["Token", "TexParser"]
 
+# An inline token: (kind, text), or ("ref", (text, label)) for a reference
+Token = Tuple[str, Any]
+
+# Block-level patterns, compiled once rather than looked up per line
+_CODE_FENCE = re.compile(r"```(\w+)")
+_UNORDERED_ITEM = re.compile(r"^[-+*]\s")
+_ORDERED_ITEM = re.compile(r"^\d+\.\s")
+_LIST_MARKER = re.compile(r"^(?:[-+*]|\d+\.)\s")
+_INCLUDE = re.compile(r"^!include\s+(.+)$")
+_HEADING = re.compile(r"^(#+)\s+(.*)")
+_IMAGE = re.compile(r"!\[([^\]]+)\]\(([^)]+)\)")
+_TABLE_DELIMITER = re.compile(r":?-+:?")
+_TABLE_CELL_SEPARATOR = re.compile(r"(?<!\\)\|")
+
+
+@mypyc_attr(allow_interpreted_subclasses=True)
 class TexParser:
-    def __init__(self):
+    def __init__(
+        self,
+        resolver: Optional[IncludeResolver] = None,
+        base_dir: Optional[str] = None,
+        source_path: Optional[str] = None,
+        limits: Optional[ParserLimits] = None,
+        section: Optional[str] = None,
+    ) -> None:
+        """
+        Args:
+            resolver: IncludeResolver shared between parses, used to cache
+                included files and record the dependency graph
+            base_dir: Directory that include paths are relative to
+                (defaults to the directory of `source_path`, or the cwd)
+            source_path: Path of the file being parsed, if any
+            limits: ParserLimits for this parse (defaults to the resolver's)
+            section: Path of the only section that will be rendered, e.g.
+                "Chapter 3/Results". Content outside it is skipped instead of
+                parsed; headings and includes are still parsed for the outline.
+                Included files are parsed in full, as they are cached and
+                shared with other documents.
+        """
+        if resolver is None:
+            resolver = IncludeResolver(limits=limits)
+        self.resolver = resolver
+        self.limits: ParserLimits = limits if limits is not None else resolver.limits
+        self.reset(source_path=source_path, base_dir=base_dir, section=section)
+
+    def reset(
+        self,
+        source_path: Optional[str] = None,
+        base_dir: Optional[str] = None,
+        section: Optional[str] = None,
+    ) -> None:
+        """
+        Discard all parse state so the parser can be reused for another document.
+
+        The resolver and limits are kept; the arguments are as for __init__.
+        """
+        self.line_number = 0
+        # Nodes of this document, and of it and its included documents
+        self.node_count = 0
+        self.node_total = 0
+        self.source_path = source_path
+        if base_dir is None and source_path is not None:
+            base_dir = os.path.dirname(os.path.abspath(source_path))
+        self.base_dir = base_dir
         self.document = xwm.Document()
+        self.document.source_path = source_path
+        # First line of the open code block, formula block or table header
+        self.block_line = 0
+        # Text lines of the paragraph being accumulated, and its first line
+        self.paragraph_lines: List[str] = []
+        self.paragraph_line = 0
         self.in_code_block = False
-        self.current_code_block = None
-        self.current_list = None
+        self.current_code_block: Optional[xwm.CodeBlock] = None
+        self.current_list: Union[xwm.OrderedList, xwm.UnorderedList, None] = None
         self.in_formula_block = False
-        self.current_formula_content = []
+        self.current_formula_content: List[str] = []
+        self.current_table: Optional[xwm.Table] = None
+        self.pending_table_row: Optional[str] = None
+        self.section_path: Optional[List[str]] = None
+        self.in_selection = True
+        self._heading_stack: List[xwm.Heading] = []
+        if section is not None:
+            self.section_path = [p.strip() for p in section.split("/") if p.strip()]
+            self.in_selection = False
 
-    def parse(self, markdown_text):
-        lines = markdown_text.splitlines()
-        for line in lines:
-            self._parse_line(line)
+    def parse(self, markdown_text: str) -> None:
+        self.parse_lines(markdown_text.splitlines())
 
-    def _preprocess_line(self, line):
+    def parse_lines(self, lines: Iterable[str]) -> None:
+        """
+        Parse Markdown from an iterable of lines without line terminators.
+
+        This allows parsing straight from a (possibly decompressing) stream,
+        e.g. `parser.parse_lines(line.rstrip("\\n") for line in f)`.
+        """
+        if self.resolver.depth == 0:
+            # The outermost document of an include tree starts the node count
+            self.resolver.reset_node_count(self.node_total)
+        if self.source_path is not None:
+            self.resolver.enter(self.source_path)
+        max_line_length = self.limits.max_line_length
+        try:
+            for line in lines:
+                self.line_number += 1
+                if max_line_length is not None and len(line) > max_line_length:
+                    raise ParseLimitError(
+                        f"line is longer than the limit of {max_line_length} "
+                        "characters",
+                        self.line_number,
+                    )
+                self._parse_line(line)
+            self._flush_pending_table_row()
+            self._flush_paragraph()
+            self.document.line_count = self.line_number
+            self.document.node_count = self.node_count
+        finally:
+            if self.source_path is not None:
+                self.resolver.exit()
+
+    def _preprocess_line(self, line: str) -> str:
         # remove leading and trailing whitespaces
         line = line.strip()
-        # remove trailing comments
-        line = re.sub(r"<!--.*-->", "", line)
+        # remove comments
+        if "<!--" in line:
+            line = self._strip_comments(line)
         return line
 
-    def _parse_line(self, line):
+    def _strip_comments(self, line: str) -> str:
+        # Scan with str.find rather than a regex so that many unterminated
+        # "<!--" markers cannot cause quadratic backtracking.
+        parts: List[str] = []
+        pos = 0
+        while True:
+            start = line.find("<!--", pos)
+            if start < 0:
+                break
+            end = line.find("-->", start + 4)
+            if end < 0:
+                break
+            parts.append(line[pos:start])
+            pos = end + 3
+        parts.append(line[pos:])
+        return "".join(parts)
+
+    def _add_nodes(self, count: int) -> None:
+        self.node_count += count
+        self._count_nodes(count)
+
+    def _count_nodes(self, count: int) -> None:
+        """
+        Count nodes against `max_nodes`.
+
+        The limit applies to the whole include tree: the resolver keeps a
+        running total for the tree being parsed by the current thread.
+        """
+        self.node_total += count
+        total = self.resolver.count_nodes(count)
+        max_nodes = self.limits.max_nodes
+        if max_nodes is not None and total > max_nodes:
+            raise ParseLimitError(
+                f"document has more than {max_nodes} nodes", self.line_number
+            )
+
+    def _check_include(self, path: str) -> None:
+        """Raise ParseLimitError if the limits forbid including `path`."""
+        limits = self.limits
+        if not limits.allow_includes:
+            raise ParseLimitError(
+                "include directives are not allowed", self.line_number
+            )
+        if limits.max_nesting is not None and self.resolver.depth >= limits.max_nesting:
+            raise ParseLimitError(
+                f"includes are nested more than {limits.max_nesting} levels deep",
+                self.line_number,
+            )
+        if limits.include_root is not None:
+            root = os.path.realpath(limits.include_root)
+            full_path = os.path.realpath(os.path.join(self.base_dir or "", path))
+            if os.path.commonpath([root, full_path]) != root:
+                raise ParseLimitError(
+                    f"included file '{path}' is outside {limits.include_root}",
+                    self.line_number,
+                )
+
+    def _add_component(self, component: Any, line: Optional[int] = None) -> None:
+        # Any other block ends the paragraph before it
+        if self.paragraph_lines:
+            self._flush_paragraph()
+        self._add_nodes(1)
+        self.document.add_component(
+            component, self.line_number if line is None else line
+        )
+
+    def _parse_line(self, line: str) -> None:
+
+        # Table rows and the delimiter row after a table header
+        if self.current_table is not None or self.pending_table_row is not None:
+            if self._parse_table_line(self._preprocess_line(line)):
+                return
 
         # Block formula ($$...$$)
         if line.startswith("$$"):
             if self.in_formula_block:
-                # close formula block
+                # close formula block, optionally labeled: $$ {#eq:name}
                 formula_content = "\n".join(self.current_formula_content)
-                self.document.add_component(xwm.FormulaBlock(formula_content))
+                _, label = self._split_label(line[2:].strip())
+                if self.in_selection:
+                    self._add_component(
+                        xwm.FormulaBlock(formula_content, label=label),
+                        self.block_line,
+                    )
+                elif label is not None:
+                    self.doc.add_label(xwm.FormulaBlock(formula_content, label=label))
                 self.in_formula_block = False
                 self.current_formula_content = []
             else:
                 # open formula block
                 self.in_formula_block = True
+                self.block_line = self.line_number
                 # Check if there's content on the same line
                 content_on_line = line[2:].strip()
                 if content_on_line:
@@ -53,112 +244,338 @@ class TexParser:
         if line.startswith("```"):
             if self.in_code_block:
                 # close codeblock
-                self.document.add_component(self.current_code_block)
+                if self.in_selection:
+                    self._add_component(self.current_code_block, self.block_line)
                 self.in_code_block = False
                 self.current_code_block = None
             else:
                 # open codeblock
-                pattern = r"```(\w+)"
-                match = re.match(pattern, line)
+                match = _CODE_FENCE.match(line)
                 if match:
                     language = match.group(1)
                     self.current_code_block = xwm.CodeBlock(lang=language)
                 else:
                     self.current_code_block = xwm.CodeBlock()
                 self.in_code_block = True
+                self.block_line = self.line_number
             return
 
-        if self.in_code_block:
+        code_block = self.current_code_block
+        if self.in_code_block and code_block is not None:
             # append code to codeblock
-            self.current_code_block.add_code(line)
+            code_block.add_code(line)
             return
 
         # remove leading and trailing whitespaces
         line = self._preprocess_line(line)
 
+        # Outside the selected section only headings and includes are parsed,
+        # and images are scanned for their labels
+        if not self.in_selection and not (
+            line.startswith("#") or line.startswith("!include")
+        ):
+            image = self._parse_image(line) if line.startswith("!") else None
+            if image is not None:
+                self.doc.add_label(image)
+            return
+
         # slide break (---)
         if line == "---":
             self.current_list = None
-            self.document.add_component(xwm.SlideBreak())
+            self._add_component(xwm.SlideBreak())
             return
 
         # unordered list
-        if re.match(r"^[-+*]\s", line):
+        if _UNORDERED_ITEM.match(line):
             if self.current_list is None or not isinstance(
                 self.current_list, xwm.UnorderedList
             ):
                 # start new unordered list
                 self.current_list = xwm.UnorderedList()
-                self.document.add_component(self.current_list)
+                self._add_component(self.current_list)
             self._parse_list_item(line, self.current_list)
             return
 
         # ordered list
-        if re.match(r"^\d+\.\s", line):
+        if _ORDERED_ITEM.match(line):
             if self.current_list is None or not isinstance(
                 self.current_list, xwm.OrderedList
             ):
                 # start new ordered list
                 self.current_list = xwm.OrderedList()
-                self.document.add_component(self.current_list)
+                self._add_component(self.current_list)
             self._parse_list_item(line, self.current_list)
             return
 
         self.current_list = None
 
+        # table header; becomes a table if a delimiter row follows
+        if line.startswith("|"):
+            self.pending_table_row = line
+            self.block_line = self.line_number
+            return
+
+        # include directive (!include path/to/file.md)
+        match = _INCLUDE.match(line)
+        if match:
+            path = match.group(1).strip()
+            self._check_include(path)
+            nodes_before = self.resolver.node_count
+            include = self.resolver.include(path, self.base_dir, self.limits)
+            # Nodes parsed for the include were counted as they were added;
+            # cached sub-documents were not parsed, so count them now
+            parsed = self.resolver.node_count - nodes_before
+            self.node_total += parsed
+            self._count_nodes(include.document.total_node_count - parsed)
+            self._add_component(include)
+            return
+
         # heading
-        pattern = r"^(#+)\s+(.*)"
-        match = re.match(pattern, line)
+        match = _HEADING.match(line)
         if match:
             level = len(match.group(1))
-            title = self._parse_content(match.group(2))
-            self.document.add_component(xwm.Heading(title=title, level=level))
+            text, label = self._split_label(match.group(2))
+            title = self._parse_content(text)
+            heading = xwm.Heading(title=title, level=level, label=label)
+            self._add_component(heading)
+            if self.section_path is not None:
+                self._update_selection(heading, self.section_path)
             return
 
         # image
-        pattern = r"!\[([^\]]+)\]\(([^)]+)\)"
-        match = re.match(pattern, line)
-        if match:
-            caption = self._parse_content(match.group(1))
-            path = match.group(2)
-            self.document.add_component(xwm.Image(path=path, caption=caption))
+        image = self._parse_image(line)
+        if image is not None:
+            self._add_component(image)
             return
 
-        # paragraph
-        content = self._parse_content(line)
-        if len(content.components) > 0:
-            self.document.add_component(xwm.Paragraph(content))
+        # paragraph text; consecutive lines form one paragraph, which ends at
+        # a blank line or at the next block
+        if line:
+            self._add_paragraph_line(line, self.line_number)
+        elif self.paragraph_lines:
+            self._flush_paragraph()
 
-    def _parse_content(self, line):
-        # 正则表达式匹配内联代码和公式
-        pattern = r"(\*\*[^*]+\*\*|\*[^*]+\*|`[^`]+`|\$[^$]+\$|[^`$*]+)"
-        matches = re.findall(pattern, line)
+    def _parse_image(self, line: str) -> Optional["xwm.Image"]:
+        """Parse an image line (![caption](path){#label}), or return None."""
+        match = _IMAGE.match(line)
+        if match is None:
+            return None
+        caption = self._parse_content(match.group(1))
+        _, label = self._split_label(line[match.end() :])
+        return xwm.Image(path=match.group(2), caption=caption, label=label)
 
+    def _add_paragraph_line(self, line: str, line_number: int) -> None:
+        if not self.paragraph_lines:
+            self.paragraph_line = line_number
+        self.paragraph_lines.append(line)
+
+    def _flush_paragraph(self) -> None:
+        # Inline markup is parsed across the joined lines, so "**bold**" may
+        # span a line break; the breaks are kept in the output.
+        text = "\n".join(self.paragraph_lines)
+        self.paragraph_lines = []
+        content = self._parse_content(text)
+        if len(content.components) > 0:
+            self._add_component(xwm.Paragraph(content), self.paragraph_line)
+
+    def _parse_content(self, line: str) -> "xwm.Content":
         content = xwm.Content()
+        tokens = self._tokenize_inline(line)
+        self._add_nodes(len(tokens) + 1)
 
-        for match in matches:
-            if match.startswith("`") and match.endswith("`"):
+        for kind, text in tokens:
+            if kind == "`":
                 # 内联代码
-                content.add_component(xwm.InlineCode(match[1:-1]))
-            elif match.startswith("$") and match.endswith("$"):
+                content.add_component(xwm.InlineCode(text))
+            elif kind == "$":
                 # 数学公式
-                content.add_component(xwm.InlineFormula(match[1:-1]))
-            elif match.startswith("**") and match.endswith("**"):
-                content.add_component(xwm.InlineBold(match[2:-2]))
-            elif match.startswith("*") and match.endswith("*"):
-                content.add_component(xwm.InlineItalic(match[1:-1]))
+                content.add_component(xwm.InlineFormula(text))
+            elif kind == "**":
+                content.add_component(xwm.InlineBold(text))
+            elif kind == "*":
+                content.add_component(xwm.InlineItalic(text))
+            elif kind == "ref":
+                content.add_component(xwm.Reference(label=text[1], text=text[0]))
             else:
                 # 普通文本
-                content.add_component(xwm.Text(match))
+                content.add_component(xwm.Text(text))
 
         return content
 
-    def _parse_list_item(self, line, list_obj):
+    def _tokenize_inline(self, line: str) -> List[Token]:
+        """
+        Split a line into (kind, text) inline tokens in linear time.
+
+        A span runs from a delimiter to the next occurrence of the same
+        delimiter and must not be empty; unmatched delimiters are dropped.
+        References have the form [text](#label); a "[" that does not start
+        one is kept as text.
+        The next position of each delimiter is cached, so every character is
+        scanned a bounded number of times whatever the input looks like.
+        """
+        n = len(line)
+        # char -> (start, index of the first occurrence at or after start)
+        next_at: Dict[str, Tuple[int, int]] = {}
+
+        def find(char: str, start: int) -> int:
+            cached = next_at.get(char)
+            if cached is not None and cached[0] <= start <= cached[1]:
+                return cached[1]
+            index = line.find(char, start)
+            if index < 0:
+                index = n
+            next_at[char] = (start, index)
+            return index
+
+        tokens: List[Token] = []
+        pos = 0
+        while pos < n:
+            char = line[pos]
+            if char == "*":
+                if line.startswith("**", pos):
+                    end = find("*", pos + 2)
+                    if end > pos + 2 and line.startswith("**", end):
+                        tokens.append(("**", line[pos + 2 : end]))
+                        pos = end + 2
+                    else:
+                        pos += 1
+                    continue
+                end = find("*", pos + 1)
+                if pos + 1 < end < n:
+                    tokens.append(("*", line[pos + 1 : end]))
+                    pos = end + 1
+                else:
+                    pos += 1
+            elif char == "[":
+                # reference to a label: [text](#label)
+                close = find("]", pos + 1)
+                if close < n and line.startswith("(#", close + 1):
+                    end = find(")", close + 3)
+                    if close + 3 < end < n:
+                        text = line[pos + 1 : close]
+                        tokens.append(("ref", (text, line[close + 3 : end])))
+                        pos = end + 1
+                        continue
+                tokens.append(("", "["))
+                pos += 1
+            elif char == "`" or char == "$":
+                end = find(char, pos + 1)
+                if pos + 1 < end < n:
+                    tokens.append((char, line[pos + 1 : end]))
+                    pos = end + 1
+                else:
+                    pos += 1
+            else:
+                end = min(
+                    find("*", pos), find("`", pos), find("$", pos), find("[", pos)
+                )
+                tokens.append(("", line[pos:end]))
+                pos = end
+        return tokens
+
+    def _update_selection(self, heading: "xwm.Heading", parts: List[str]) -> None:
+        """Track whether the lines after `heading` are in the selected section."""
+        stack = self._heading_stack
+        while stack and stack[-1].level >= heading.level:
+            stack.pop()
+        stack.append(heading)
+
+        self.in_selection = len(stack) >= len(parts) and all(
+            xwm.heading_matches(h.title_text, h.label, part)
+            for h, part in zip(stack, parts)
+        )
+
+    def _split_label(self, text: str) -> Tuple[str, Optional[str]]:
+        """Split a trailing {#label} attribute off text; returns (text, label)."""
+        if text.endswith("}"):
+            start = text.rfind("{#")
+            label = text[start + 2 : -1]
+            if start >= 0 and label and not any(c.isspace() for c in label):
+                return text[:start].rstrip(), label
+        return text, None
+
+    def _parse_table_line(self, line: str) -> bool:
+        """Continue a table; returns False if the line does not belong to it."""
+        if self.current_table is not None:
+            if line.startswith("|"):
+                self._add_nodes(1)
+                self.current_table.add_row(self._parse_table_row(line))
+                return True
+            table = self.current_table
+            self.current_table = None
+            # pandoc-style caption directly after the table
+            if line.startswith("Table:"):
+                table.caption = self._parse_content(line[6:].strip())
+                return True
+            return False
+
+        header = self.pending_table_row
+        if header is None:
+            return False
+        self.pending_table_row = None
+        header_cells = self._split_table_row(header)
+        delimiters = self._split_table_row(line) if line.startswith("|") else []
+        if len(delimiters) != len(header_cells) or not all(
+            _TABLE_DELIMITER.fullmatch(d) for d in delimiters
+        ):
+            self._flush_table_header(header)
+            return False
+
+        alignment = "".join(
+            "c" if d[0] == ":" and d[-1] == ":" else "r" if d[-1] == ":" else "l"
+            for d in delimiters
+        )
+        table = xwm.Table(header=self._parse_table_row(header), alignment=alignment)
+        self.current_table = table
+        self._add_component(table, self.block_line)
+        return True
+
+    def _flush_pending_table_row(self) -> None:
+        header = self.pending_table_row
+        if header is not None:
+            self.pending_table_row = None
+            self._flush_table_header(header)
+
+    def _flush_table_header(self, line: str) -> None:
+        # A "|" line without a delimiter row is ordinary paragraph text
+        self._add_paragraph_line(line, self.block_line)
+
+    def _split_table_row(self, line: str) -> List[str]:
+        line = line.strip()
+        if line.startswith("|"):
+            line = line[1:]
+        if line.endswith("|") and not line.endswith("\\|"):
+            line = line[:-1]
+        cells = _TABLE_CELL_SEPARATOR.split(line)
+        return [c.strip().replace("\\|", "|") for c in cells]
+
+    def _parse_table_row(self, line: str) -> Tuple[Any, ...]:
+        """
+        Parse a table row into a tuple of cells.
+
+        Cells without inline markup are stored as pre-escaped strings rather
+        than node objects, which keeps very large tables compact.
+        """
+        cells: List[Any] = []
+        for cell in self._split_table_row(line):
+            cell = cell.replace("&", "\\&")
+            if "*" in cell or "`" in cell or "$" in cell:
+                cells.append(self._parse_content(cell))
+            else:
+                cells.append(xwm.preprocess_text(cell))
+        width = len(self.current_table.header) if self.current_table else len(cells)
+        if len(cells) < width:
+            cells.extend([""] * (width - len(cells)))
+        return tuple(cells[:width])
+
+    def _parse_list_item(
+        self, line: str, list_obj: Union["xwm.OrderedList", "xwm.UnorderedList"]
+    ) -> None:
         item = xwm.ListItem()
-        content = re.sub(r"^[-+*]\s|\d+\.\s", "", line).strip()
+        content = _LIST_MARKER.sub("", line).strip()
         item.add_component(self._parse_content(content))
         list_obj.add_item(item)
 
     @property
-    def doc(self):
+    def doc(self) -> "xwm.Document":
         return self.document
@@ -0,0 +1,127 @@
+import os
+import time
+
+from texweaver import ASSET_CACHE_NAME, AssetPipeline, Converter
+from texweaver.entrypoint import process_file
+
+
+def write_images(directory, names, content=b"png data"):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        (directory / name).write_bytes(content)
+
+
+def test_missing_images_are_reported(tmp_path):
+    """Test that images are resolved relative to the file that references them."""
+    (tmp_path / "chapters").mkdir()
+    write_images(tmp_path / "chapters", ["plot.png"])
+    (tmp_path / "chapters" / "ch1.md").write_text(
+        "Text\n\n![Plot](plot.png)\n\n![Gone](gone.png)\n"
+    )
+    (tmp_path / "book.md").write_text("!include chapters/ch1.md\n\n![Plot](plot.png)\n")
+
+    document = Converter().parse_file(str(tmp_path / "book.md"))
+    report = AssetPipeline().process(document)
+
+    assert report.references == 3
+    assert len(report.assets) == 1
+    assert [(m.path, m.line) for m in report.missing] == [
+        ("gone.png", 5),
+        ("plot.png", 3),
+    ]
+    assert (
+        str(report.missing[1])
+        == f"{tmp_path / 'book.md'}:3: image 'plot.png' not found"
+    )
+
+
+def test_paths_rewritten_and_deduplicated(tmp_path):
+    """Test that identical files become one asset, relative to the output."""
+    write_images(tmp_path / "src", ["a.png", "copy-of-a.png"])
+    write_images(tmp_path / "src", ["b.png"], content=b"other data")
+    write_images(tmp_path / "src", ["diagram.pdf"])
+    (tmp_path / "src" / "doc.md").write_text(
+        "![A](a.png)\n\n![Copy](copy-of-a.png)\n\n![B](b.png)\n\n![D](diagram)\n"
+    )
+    (tmp_path / "build").mkdir()
+
+    converter = Converter()
+    document = converter.parse_file(str(tmp_path / "src" / "doc.md"))
+    report = AssetPipeline(str(tmp_path / "build")).process(document)
+    latex = converter.renderer().render_document(document)
+
+    assert len(report.assets) == 2
+    assert report.duplicates == 2
+    assert "\\includegraphics[width=0.8\\textwidth]{../src/a.png}" in latex
+    assert latex.count("{../src/a.png}") == 3
+    assert "{../src/b.png}" in latex
+    assert "copy-of-a.png" not in latex
+    assert "diagram" not in latex
+
+
+def test_copy_and_warm_cache(tmp_path):
+    """Test copying assets and reusing cached hashes between runs."""
+    write_images(tmp_path, ["a.png", "b.png"])
+    write_images(tmp_path, ["c.jpg"], content=b"jpeg data")
+    (tmp_path / "doc.md").write_text("![A](a.png)\n\n![B](b.png)\n\n![C](c.jpg)\n")
+    out = tmp_path / "out"
+    out.mkdir()
+    cache = str(out / ASSET_CACHE_NAME)
+
+    def run():
+        document = Converter().parse_file(str(tmp_path / "doc.md"))
+        pipeline = AssetPipeline(str(out), copy_dir="images", cache_path=cache)
+        return pipeline, pipeline.process(document), document
+
+    pipeline, report, document = run()
+    assert (pipeline.hash_count, report.copied) == (3, 2)
+    copied = sorted(os.listdir(out / "images"))
+    assert len(copied) == 2
+    png = document.components[0].resolved_path
+    assert png.startswith("images/") and png.endswith(".png")
+    assert document.components[1].resolved_path == png
+    assert (out / document.components[2].resolved_path).read_bytes() == b"jpeg data"
+
+    pipeline, report, _ = run()
+    assert (pipeline.hash_count, report.copied) == (0, 0)
+
+    (tmp_path / "c.jpg").write_bytes(b"new jpeg data")
+    pipeline, report, document = run()
+    assert (pipeline.hash_count, report.copied) == (1, 1)
+    assert (out / document.components[2].resolved_path).read_bytes() == b"new jpeg data"
+
+
+def test_cli_copy_images(tmp_path, capsys):
+    """Test checking and copying images from the CLI."""
+    write_images(tmp_path / "figs", ["plot.png"])
+    (tmp_path / "doc.md").write_text("![Plot](figs/plot.png)\n\n![Gone](gone.png)\n")
+    out = tmp_path / "build" / "doc.tex"
+    out.parent.mkdir()
+
+    process_file(str(tmp_path / "doc.md"), str(out), image_dir="assets")
+    printed = capsys.readouterr().out
+
+    assert "Warning: " in printed and "image 'gone.png' not found" in printed
+    assert "Copied 1 of 1 images to 'assets'" in printed
+    assert "{assets/" in out.read_text()
+    assert "{gone.png}" in out.read_text()
+    assert (out.parent / ASSET_CACHE_NAME).exists()
+
+
+def test_many_images_warm_cache(tmp_path):
+    """Benchmark: thousands of images validate quickly on a warm cache."""
+    names = [f"img{i}.png" for i in range(3000)]
+    write_images(tmp_path, names)
+    text = "\n\n".join(f"![Image {i}]({name})" for i, name in enumerate(names))
+    document = Converter().parse(text, source_path=str(tmp_path / "deck.md"))
+    cache = str(tmp_path / ASSET_CACHE_NAME)
+
+    AssetPipeline(str(tmp_path), cache_path=cache).process(document)
+    pipeline = AssetPipeline(str(tmp_path), cache_path=cache)
+    start = time.perf_counter()
+    report = pipeline.process(document)
+    elapsed = time.perf_counter() - start
+
+    assert pipeline.hash_count == 0
+    assert report.references == 3000 and report.duplicates == 2999
+    assert elapsed < 1.0
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from texweaver import Converter, IncludeResolver, TexConfig, TexParser
+
+
+def make_source(i):
+    return f"""# Document {i}
+
+Paragraph *{i}* with **bold**, `code` and $x_{i}$.
+
+| a | b |
+|---|---|
+| {i} | {i * 2} |
+
+- item {i}
+- see [](#document-{i})
+"""
+
+
+def test_convert_matches_parser():
+    """Test that Converter produces the same output as TexParser."""
+    config = TexConfig("default")
+    parser = TexParser()
+    parser.parse(make_source(1))
+    expected = parser.doc.to_latex(config)
+
+    assert Converter(config).convert(make_source(1)) == expected
+
+
+def test_config_is_frozen():
+    """Test that the converter's config is an immutable snapshot."""
+    config = TexConfig("default")
+    converter = Converter(config)
+    config.config["formatting"]["bold"] = "BOLD({content})"
+
+    assert "\\textbf{x}" in converter.convert("**x**")
+    with pytest.raises(TypeError):
+        converter.config.config["formatting"]["bold"] = "x"
+
+
+def test_parser_reset():
+    """Test that a parser can be reused after reset."""
+    parser = TexParser()
+    parser.parse("```python\nunterminated")
+    parser.reset()
+    parser.parse("# Title")
+
+    assert len(parser.doc.components) == 1
+    assert not parser.in_code_block
+
+
+def test_thread_pool(tmp_path):
+    """Test that one converter can be shared by many threads."""
+    (tmp_path / "shared.md").write_text("## Shared\n\nShared text\n")
+    converter = Converter(TexConfig("default"))
+    sources = [make_source(i) + "\n!include shared.md\n" for i in range(200)]
+    paths = [str(tmp_path / f"doc{i}.md") for i in range(200)]
+
+    expected = [converter.convert(s, p) for s, p in zip(sources, paths)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(converter.convert, sources, paths))
+
+    assert results == expected
+    assert all("Shared text" in r for r in results)
+
+
+def test_thread_pool_shared_resolver(tmp_path):
+    """Test that threads can share an include cache."""
+    (tmp_path / "shared.md").write_text("## Shared\n\nShared text\n")
+    resolver = IncludeResolver()
+    converter = Converter(TexConfig("default"), resolver=resolver)
+    path = str(tmp_path / "doc.md")
+
+    def convert(_):
+        return converter.convert("!include shared.md", path)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(convert, range(100)))
+
+    assert len(set(results)) == 1
+    assert "Shared text" in results[0]
+    # Concurrent first loads may race, but the cache is used afterwards
+    assert resolver.parse_count <= 8
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from texweaver import DefaultConfig, IncludeCycleError, IncludeResolver, TexParser
+
+
+def test_include_renders_sub_document(tmp_path):
+    """Test that included files are rendered in place."""
+    (tmp_path / "chapter.md").write_text("## Chapter\n\nChapter text.\n")
+    (tmp_path / "book.md").write_text("# Book\n\n!include chapter.md\n\nThe end.\n")
+
+    parser = TexParser(source_path=str(tmp_path / "book.md"))
+    parser.parse((tmp_path / "book.md").read_text())
+    latex = parser.doc.to_latex(DefaultConfig)
+
+    assert latex.index("\\section{Book}") < latex.index("\\subsection{Chapter}")
+    assert latex.index("Chapter text.") < latex.index("The end.")
+
+
+def test_include_cache_and_dependency_graph(tmp_path):
+    """Test that only changed fragments are re-parsed."""
+    (tmp_path / "parts").mkdir()
+    (tmp_path / "parts" / "a.md").write_text("A text\n\n!include b.md\n")
+    (tmp_path / "parts" / "b.md").write_text("B text\n")
+    (tmp_path / "book.md").write_text("!include parts/a.md\n")
+
+    resolver = IncludeResolver()
+    resolver.load(str(tmp_path / "book.md"))
+    assert resolver.parse_count == 3
+
+    book = str(tmp_path / "book.md")
+    a = resolver.normalize(str(tmp_path / "parts" / "a.md"))
+    b = resolver.normalize(str(tmp_path / "parts" / "b.md"))
+    assert resolver.dependencies(book) == [a]
+    assert resolver.dependencies(book, transitive=True) == sorted([a, b])
+    assert resolver.dependents(b, transitive=True) == sorted(
+        [a, resolver.normalize(book)]
+    )
+
+    # Unchanged files are served from the cache
+    resolver.load(book)
+    assert resolver.parse_count == 3
+
+    # Changing a leaf re-parses only that leaf
+    (tmp_path / "parts" / "b.md").write_text("B changed\n")
+    st = os.stat(b)
+    os.utime(b, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    doc = resolver.load(book)
+    assert resolver.parse_count == 4
+    assert "B changed" in doc.to_latex(DefaultConfig)
+
+
+def test_include_cycle_detected(tmp_path):
+    """Test that include cycles raise an error."""
+    (tmp_path / "a.md").write_text("!include b.md\n")
+    (tmp_path / "b.md").write_text("!include a.md\n")
+
+    with pytest.raises(IncludeCycleError):
+        IncludeResolver().load(str(tmp_path / "a.md"))
+
+
+def test_label_index_is_cached_and_refreshed(tmp_path):
+    """Test that labels are indexed once and again after an include changes."""
+    (tmp_path / "chapter.md").write_text("## Old\n")
+    (tmp_path / "part.md").write_text("# Part\n\n!include chapter.md\n")
+    part = str(tmp_path / "part.md")
+
+    resolver = IncludeResolver()
+    doc = resolver.load(part)
+    index, _ = doc.label_scope()
+    assert doc.label_scope()[0] is index
+    assert doc.labels is index.labels
+    assert doc.resolve_label("old") == "sec:old"
+
+    chapter = str(tmp_path / "chapter.md")
+    (tmp_path / "chapter.md").write_text("## New\n")
+    st = os.stat(chapter)
+    os.utime(chapter, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert resolver.load(part) is doc
+    assert doc.label_scope()[0] is not index
+    assert doc.resolve_label("new") == "sec:new"
+    assert doc.resolve_label("old") is None
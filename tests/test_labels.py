@@ -0,0 +1,100 @@
+from texweaver import (
+    Converter,
+    DefaultConfig,
+    IncludeResolver,
+    LatexRenderer,
+    TexConfig,
+    TexParser,
+)
+from texweaver import markdown as xwm
+
+
+def test_labels_are_unique():
+    """Test that duplicate titles get numbered labels."""
+    parser = TexParser()
+    parser.parse("# Intro\n# Intro\n![Intro](a.png)\n![Intro](b.png)\n")
+    labels = parser.doc.labels
+
+    assert list(labels) == ["sec:intro", "sec:intro-1", "fig:intro", "fig:intro-1"]
+    assert labels["fig:intro-1"].path == "b.png"
+
+
+def test_explicit_labels():
+    """Test {#label} attributes on headings, images and formulas."""
+    parser = TexParser()
+    parser.parse("## Results {#res}\n![Cat](cat.png){#fig:cat}\n$$\nx\n$$ {#eq:x}\n")
+    labels = parser.doc.labels
+
+    assert isinstance(labels["res"], xwm.Heading)
+    assert labels["res"].title.plain_text() == "Results"
+    assert isinstance(labels["fig:cat"], xwm.Image)
+    assert isinstance(labels["eq:x"], xwm.FormulaBlock)
+
+    latex = parser.doc.to_latex(DefaultConfig)
+    assert "\\subsection{Results}\\label{res}" in latex
+    assert "\\label{fig:cat}" in latex
+    assert "\\begin{equation}\n\\label{eq:x}" in latex
+
+
+def test_references_resolve():
+    """Test that references resolve, with or without the label prefix."""
+    parser = TexParser()
+    parser.parse("# Setup\nSee [Section](#setup), [](#sec:setup) and [](#missing).")
+    renderer = LatexRenderer(DefaultConfig)
+    latex = renderer.render_document(parser.doc)
+
+    assert "See Section~\\ref{sec:setup}, \\ref{sec:setup} and" in latex
+    assert renderer.unresolved_references == ["missing"]
+
+
+def test_labels_from_includes(tmp_path):
+    """Test that labels in included files are visible from the parent."""
+    (tmp_path / "part.md").write_text("## Part\n")
+    parser = TexParser(base_dir=str(tmp_path))
+    parser.parse("# Main\n!include part.md\n")
+
+    assert parser.doc.resolve_label("part") == "sec:part"
+    assert "sec:main" in parser.doc.labels
+
+
+def test_labels_unique_across_includes(tmp_path):
+    """Test that a fragment included twice gets its own labels in each copy."""
+    (tmp_path / "frag.md").write_text("# Intro\n\n![Plot](a.png)\n\nSee [](#intro).\n")
+    (tmp_path / "main.md").write_text(
+        "# Intro\n\n![Plot](a.png)\n\n!include frag.md\n\n!include frag.md\n"
+    )
+    converter = Converter(resolver=IncludeResolver())
+    document = converter.parse_file(str(tmp_path / "main.md"))
+    labels = document.labels
+
+    assert type(labels) is dict
+    assert list(labels) == [
+        "sec:intro",
+        "fig:plot",
+        "sec:intro-1",
+        "fig:plot-1",
+        "sec:intro-2",
+        "fig:plot-2",
+    ]
+    assert [section.label for section in document.outline] == list(labels)[::2]
+
+    latex = converter.renderer().render_document(document)
+    assert latex.count("\\label{sec:intro-1}") == 1
+    assert latex.count("\\label{fig:plot-2}") == 1
+    # References inside each copy point at that copy's heading
+    assert "See \\ref{sec:intro-1}." in latex
+    assert "See \\ref{sec:intro-2}." in latex
+
+    sub = converter.renderer().render_document(document.subdocument("sec:intro-2"))
+    assert "\\label{sec:intro-2}" in sub and "\\label{fig:plot-2}" in sub
+
+
+def test_reference_without_template(tmp_path):
+    """Test that references render as \\ref when a template lacks internal_ref."""
+    path = tmp_path / "bare.yaml"
+    path.write_text("extends: default\nlinks:\n  internal_ref: null\n")
+    source = "# Setup\nSee [Section](#setup)."
+
+    for config in (TexConfig("presentation"), TexConfig(config_file=str(path))):
+        latex = Converter(config).convert(source)
+        assert "See Section~\\ref{sec:setup}." in latex
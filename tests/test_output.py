@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from texweaver import write_if_changed
+from texweaver.entrypoint import process_file
+
+
+def test_write_if_changed(tmp_path):
+    """Test that identical output leaves the existing file untouched."""
+    path = tmp_path / "out.tex"
+
+    assert write_if_changed(str(path), lambda f: f.write("hello"))
+    assert path.read_text() == "hello"
+
+    os.utime(path, ns=(0, 0))
+    assert not write_if_changed(str(path), lambda f: f.write("hello"))
+    assert os.stat(path).st_mtime_ns == 0
+
+    assert write_if_changed(str(path), lambda f: f.write("hello!"))
+    assert path.read_text() == "hello!"
+    assert os.listdir(tmp_path) == ["out.tex"]
+
+
+def test_write_if_changed_failure_keeps_old_file(tmp_path):
+    """Test that a failed render does not clobber the existing output."""
+    path = tmp_path / "out.tex"
+    path.write_text("old")
+
+    def write(f):
+        f.write("partial")
+        raise RuntimeError("render failed")
+
+    with pytest.raises(RuntimeError):
+        write_if_changed(str(path), write)
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["out.tex"]
+
+
+def test_process_file_reports_status(tmp_path, capsys):
+    """Test that the CLI reports whether the output changed."""
+    src = tmp_path / "doc.md"
+    out = tmp_path / "doc.tex"
+    src.write_text("# Title\n")
+
+    assert process_file(str(src), str(out)) == "written"
+    assert process_file(str(src), str(out)) == "unchanged"
+    assert "(unchanged)" in capsys.readouterr().out
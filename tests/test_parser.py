@@ -2,7 +2,8 @@ from pathlib import Path
 
 import pytest
 
-from texweaver import TexParser
+from texweaver import DefaultConfig, TexParser
+from texweaver import markdown as xwm
 
 
 def test_parser_basic():
@@ -56,6 +57,43 @@ def test_parser_with_file():
         pytest.skip("No test markdown file found")
 
 
+def test_soft_wrapped_lines_form_one_paragraph():
+    """Test that consecutive text lines are merged into a single paragraph."""
+    parser = TexParser()
+    parser.parse(
+        "First line with **bold\nacross** a wrap\nand more.\n\n"
+        "Second paragraph\n# Heading\nThird\n- item"
+    )
+    components = parser.doc.components
+    assert [type(c) for c in components] == [
+        xwm.Paragraph,
+        xwm.Paragraph,
+        xwm.Heading,
+        xwm.Paragraph,
+        xwm.UnorderedList,
+    ]
+    assert list(parser.doc.source_lines) == [1, 5, 6, 7, 8]
+
+    first = components[0].content.components
+    assert [type(c) for c in first] == [xwm.Text, xwm.InlineBold, xwm.Text]
+    assert first[1].text == "bold\nacross"
+
+    latex = components[0].to_latex(DefaultConfig)
+    assert latex.count("\n\n") == 0
+    assert "\\textbf{bold\nacross} a wrap\nand more." in latex
+
+
+def test_paragraph_ends_at_code_block():
+    """Test that a block opening after text ends the paragraph."""
+    parser = TexParser()
+    parser.parse("text\n```\ncode\n```\nafter")
+    assert [type(c) for c in parser.doc.components] == [
+        xwm.Paragraph,
+        xwm.CodeBlock,
+        xwm.Paragraph,
+    ]
+
+
 if __name__ == "__main__":
     test_parser_basic()
     test_parser_with_file()
@@ -0,0 +1,112 @@
+from texweaver import DefaultConfig, LatexRenderer, TexParser, Visitor
+from texweaver import markdown as xwm
+from texweaver._compiled import is_compiled
+
+
+def test_heading_levels():
+    """Test that heading levels map to their template keys."""
+    parser = TexParser()
+    parser.parse("# One\n## Two\n##### Five\n###### Six\n")
+    renderer = LatexRenderer(DefaultConfig)
+    rendered = [renderer.visit(c) for c in parser.doc.components]
+
+    assert rendered[0].startswith("\\section{One}")
+    assert rendered[1].startswith("\\subsection{Two}")
+    assert rendered[2].startswith("\\subparagraph{Five}")
+    assert rendered[3] == "\\textbf{Six}"
+
+
+def test_nodes_outside_a_document_get_automatic_labels():
+    """Test that headings and images rendered on their own are labeled."""
+    title = xwm.Content()
+    title.add_component(xwm.Text("Getting Started"))
+    heading = xwm.Heading(title, 1).to_latex(DefaultConfig)
+    image = xwm.Image("plot.png", xwm.Content()).to_latex(DefaultConfig)
+
+    assert "\\label{sec:getting-started}" in heading
+    assert "\\label{fig:figure}" in image
+    assert "None" not in heading + image
+
+
+def test_custom_handler_on_subclass():
+    """Test that custom node handlers can be registered without patching."""
+
+    class Callout:
+        def __init__(self, text):
+            self.text = text
+
+    class CalloutRenderer(LatexRenderer):
+        pass
+
+    @CalloutRenderer.handler(Callout)
+    def render_callout(renderer, node):
+        return renderer.apply("bold", content=node.text)
+
+    doc = xwm.Document()
+    doc.add_component(Callout("Careful"))
+    latex = CalloutRenderer(DefaultConfig).render_document(doc)
+
+    assert "\\textbf{Careful}" in latex
+    assert Callout not in LatexRenderer.handlers
+
+
+def test_custom_handler_replaces_streamer():
+    """Test that a handler for a streamed node type is used for documents."""
+
+    class TableRenderer(LatexRenderer):
+        pass
+
+    @TableRenderer.handler(xwm.Table)
+    def render_table(renderer, node):
+        return "TABLE"
+
+    parser = TexParser()
+    parser.parse("| a | b |\n| - | - |\n| 1 | 2 |\n")
+    assert "TABLE" in TableRenderer(DefaultConfig).render_document(parser.doc)
+    assert xwm.Table in LatexRenderer.streamers
+
+    renderer = LatexRenderer(DefaultConfig)
+    renderer.register(xwm.Table, lambda r, n: "OWN TABLE")
+    assert "OWN TABLE" in renderer.render_document(parser.doc)
+
+
+def test_custom_backend():
+    """Test that a Visitor subclass can implement another output format."""
+
+    class PlainText(Visitor):
+        pass
+
+    PlainText.handlers.update(
+        {
+            xwm.Paragraph: lambda r, n: r.visit(n.content),
+            xwm.Content: lambda r, n: "".join(r.visit(c) for c in n.components),
+            xwm.Text: lambda r, n: n.text,
+            xwm.InlineBold: lambda r, n: n.text.upper(),
+        }
+    )
+
+    parser = TexParser()
+    parser.parse("Hello **world**")
+    assert PlainText().visit(parser.doc.components[0]) == "Hello WORLD"
+
+
+def test_interpreted_subclasses():
+    """Test that Python subclasses of the (possibly compiled) classes work."""
+
+    class Shout(xwm.Text):
+        def __init__(self, text):
+            super().__init__(text.upper())
+
+    class ShoutingParser(TexParser):
+        def parse(self, text):
+            super().parse(text)
+            content = xwm.Content()
+            content.add_component(Shout("done"))
+            self.doc.add_component(xwm.Paragraph(content))
+
+    parser = ShoutingParser()
+    parser.parse("Hello")
+    latex = LatexRenderer(DefaultConfig).render_document(parser.doc)
+
+    assert isinstance(is_compiled(), bool)
+    assert "Hello" in latex and "DONE" in latex
@@ -0,0 +1,93 @@
+import pytest
+
+from texweaver import Converter, DefaultConfig, TexParser
+from texweaver import markdown as xwm
+
+BOOK = """# Preface
+Preface text
+# Chapter 3
+Intro text
+## Methods
+Methods text
+## Results {#res}
+Results text, see [](#methods)
+### Details
+Details text
+## Discussion
+Discussion text
+"""
+
+
+def test_outline():
+    """Test that the outline mirrors the heading hierarchy."""
+    parser = TexParser()
+    parser.parse(BOOK)
+    outline = parser.doc.outline
+
+    assert [s.title for s in outline] == ["Preface", "Chapter 3"]
+    chapter = outline[1]
+    assert [s.title for s in chapter.children] == ["Methods", "Results", "Discussion"]
+    assert [s.title for s in chapter.children[1].children] == ["Details"]
+    assert chapter.start == 2
+    assert chapter.end == len(parser.doc.components)
+
+
+def test_subdocument():
+    """Test rendering a single section with the normal preamble."""
+    parser = TexParser()
+    parser.parse(BOOK)
+    latex = parser.doc.subdocument("Chapter 3/Results").to_latex(DefaultConfig)
+
+    assert "\\documentclass" in latex
+    assert "Results text, see \\ref{sec:methods}" in latex
+    assert "Details text" in latex
+    assert "Methods text" not in latex
+    assert "Discussion text" not in latex
+
+    # Sections can also be named by label
+    assert parser.doc.find_section("chapter-3/res").title == "Results"
+    with pytest.raises(LookupError):
+        parser.doc.find_section("Chapter 3/Missing")
+
+
+def test_lazy_section_parsing():
+    """Test that content outside the selected section is not parsed."""
+    parser = TexParser(section="Chapter 3/Results")
+    parser.parse(BOOK)
+    latex = parser.doc.subdocument("Chapter 3/Results").to_latex(DefaultConfig)
+
+    assert "Results text" in latex and "Details text" in latex
+    # Only headings plus the section's own paragraphs were kept
+    paragraphs = [c for c in parser.doc.components if isinstance(c, xwm.Paragraph)]
+    assert len(paragraphs) == 2
+
+
+def test_section_in_included_file(tmp_path):
+    """Test that sections inside included files can be selected."""
+    (tmp_path / "ch.md").write_text("# Chapter\nText\n## Part\nPart text\n")
+    parser = TexParser(base_dir=str(tmp_path))
+    parser.parse("# Intro\nIntro text\n!include ch.md\n")
+
+    section = parser.doc.find_section("Chapter/Part")
+    assert section.document is not parser.doc
+    latex = parser.doc.subdocument("Chapter/Part").to_latex(DefaultConfig)
+    assert "Part text" in latex
+    assert "Intro text" not in latex
+
+
+def test_lazy_section_keeps_labels():
+    """Test that labels outside a lazily parsed section still resolve."""
+    source = (
+        "# Ch1\n\n![Fig](f.png)\n\n$$\nx\n$$ {#eq:x}\n\n![Fig](g.png)\n\n"
+        "# Ch2\n\n![Fig](h.png)\n\nSee [f](#fig), [](#eq:x) and [](#fig-2).\n"
+    )
+    converter = Converter()
+    lazy = converter.parse(source, section="Ch2")
+    full = converter.parse(source).subdocument("Ch2")
+
+    assert list(lazy.labels) == list(full.labels)
+    latex = converter.renderer().render_document(lazy)
+    assert latex == converter.renderer().render_document(full)
+    assert "See f~\\ref{fig:fig}, \\ref{eq:x} and \\ref{fig:fig-2}." in latex
+    assert "\\label{fig:fig-2}" in latex
+    assert "f.png" not in latex
@@ -0,0 +1,157 @@
+import gc
+import io
+import json
+import time
+
+from texweaver import Converter, SourceMap, TexConfig, TexParser, source_map_path
+from texweaver.entrypoint import lookup_source, process_file
+
+SAMPLE = """# Title
+
+Intro *text*.
+
+```python
+print(1)
+```
+
+- a
+- b
+
+| x | y |
+|---|---|
+| 1 | 2 |
+"""
+
+
+def render_with_map(text, template="default", source_path="doc.md"):
+    converter = Converter(TexConfig(template))
+    document = converter.parse(text, source_path)
+    renderer = converter.renderer()
+    renderer.source_map = SourceMap()
+    return renderer.render_document(document), renderer.source_map
+
+
+def find_line(output, text):
+    return output.split("\n").index(text) + 1
+
+
+def test_source_lines_side_table():
+    """Test that components record the line they start on."""
+    parser = TexParser()
+    parser.parse(SAMPLE)
+    assert list(parser.doc.source_lines) == [1, 3, 5, 9, 12]
+    assert parser.doc.line_count == 14
+
+
+def test_source_map_lookup():
+    """Test that output lines map back to the Markdown that produced them."""
+    output, source_map = render_with_map(SAMPLE)
+
+    assert source_map.lookup(1) is None
+    location = source_map.lookup(find_line(output, "print(1)"))
+    assert (location.source, location.start, location.end) == ("doc.md", 5, 8)
+    assert str(source_map.lookup(find_line(output, "  \\item b"))) == "doc.md:9-11"
+    assert source_map.lookup(find_line(output, "1 & 2 \\\\")).start == 12
+    assert source_map.lookup(find_line(output, "\\end{document}")) is None
+
+
+def test_source_map_does_not_change_output():
+    """Test that building a source map leaves the output as it was."""
+    for template in ("default", "presentation"):
+        output, _ = render_with_map(SAMPLE, template)
+        assert output == Converter(TexConfig(template)).convert(SAMPLE, "doc.md")
+
+
+def test_source_map_presentation_frames():
+    """Test that frame markup maps to no source line."""
+    output, source_map = render_with_map("# A\n\ntext\n\n---\n\nmore\n", "presentation")
+    assert source_map.lookup(find_line(output, "text")).start == 3
+    assert source_map.lookup(find_line(output, "more")).start == 7
+    assert source_map.lookup(find_line(output, "\\end{frame}")) is None
+
+
+def test_source_map_includes(tmp_path):
+    """Test that included content maps to the included file."""
+    (tmp_path / "part.md").write_text("first\n\nsecond\n")
+    (tmp_path / "main.md").write_text("# Main\n\n!include part.md\n\nlast\n")
+    converter = Converter()
+    document = converter.parse_file(str(tmp_path / "main.md"))
+    renderer = converter.renderer()
+    renderer.source_map = SourceMap()
+    output = renderer.render_document(document)
+    source_map = renderer.source_map
+
+    second = source_map.lookup(find_line(output, "second"))
+    assert second.source.endswith("part.md") and second.start == 3
+    last = source_map.lookup(find_line(output, "last"))
+    assert last.source.endswith("main.md") and last.start == 5
+
+
+def test_source_map_json_round_trip():
+    """Test that a written source map loads back with the same mappings."""
+    _, source_map = render_with_map(SAMPLE)
+    out = io.StringIO()
+    source_map.write(out)
+    out.seek(0)
+    loaded = SourceMap.from_json(json.load(out))
+    assert loaded.to_json() == source_map.to_json()
+    assert len(loaded) == 5
+
+
+def test_cli_source_map_lookup(tmp_path, capsys):
+    """Test writing a source map from the CLI and looking up a line."""
+    src = tmp_path / "doc.md"
+    out = tmp_path / "doc.tex.gz"
+    src.write_text(SAMPLE)
+
+    process_file(str(src), str(out), source_map=True)
+    map_path = source_map_path(str(out))
+    assert map_path == str(tmp_path / "doc.tex.map")
+
+    output = Converter().convert(SAMPLE)
+    capsys.readouterr()
+    lookup_source(str(out), find_line(output, "print(1)"))
+    assert capsys.readouterr().out.strip() == f"{src}:5-8"
+    lookup_source(map_path, 1)
+    assert "not generated from Markdown" in capsys.readouterr().out
+
+
+def test_source_map_overhead():
+    """Benchmark: building a source map adds little to rendering time."""
+    text = SAMPLE * 5_000
+    converter = Converter()
+    document = converter.parse(text)
+
+    def timed(func):
+        # As in timeit, keep collections caused by earlier tests out of it
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.process_time()
+            func()
+            return time.process_time() - start
+        finally:
+            gc.enable()
+
+    def render(source_map=None):
+        renderer = converter.renderer()
+        renderer.source_map = source_map
+        return timed(lambda: renderer.write_document(document, io.StringIO()))
+
+    # Alternate the runs so that noise from other processes hits both
+    plain, mapped, entries = [], [], []
+    for _ in range(5):
+        plain.append(render())
+        source_map = SourceMap()
+        mapped.append(render(source_map))
+        # The entries are built from the recorded marks when first read
+        entries.append(timed(lambda: len(source_map)))
+        assert len(source_map) == len(document.components)
+
+    print(
+        f"render: {min(plain):.3f}s plain, {min(mapped):.3f}s with source map, "
+        f"{min(entries):.3f}s to build its entries"
+    )
+    # About 10% interpreted and 15-20% compiled, with room for noise
+    assert min(mapped) < min(plain) * 1.35
+    assert min(entries) < min(plain) * 0.3
@@ -0,0 +1,69 @@
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from texweaver import Converter, detect_compression, open_text_reader, streams
+from texweaver.entrypoint import process_file
+
+SOURCE = "# Title\n\nSome *text*.\n"
+
+COMPRESSORS = {
+    ".gz": gzip.compress,
+    ".bz2": bz2.compress,
+    ".xz": lzma.compress,
+    ".lzma": lambda data: lzma.compress(data, format=lzma.FORMAT_ALONE),
+}
+
+
+@pytest.mark.parametrize("suffix", sorted(COMPRESSORS))
+def test_compressed_input(tmp_path, suffix):
+    """Test that compressed sources are decompressed while parsing."""
+    path = tmp_path / ("doc.md" + suffix)
+    path.write_bytes(COMPRESSORS[suffix](SOURCE.encode()))
+
+    converter = Converter()
+    expected = converter.convert(SOURCE)
+    document = converter.parse_file(str(path))
+    assert converter.renderer().render_document(document) == expected
+
+
+def test_detection_uses_magic_bytes(tmp_path):
+    """Test that compression is detected from content, not just the name."""
+    path = tmp_path / "doc.md"
+    path.write_bytes(gzip.compress(SOURCE.encode()))
+
+    assert detect_compression(str(path)) == "gzip"
+    with open_text_reader(str(path)) as f:
+        assert f.read() == SOURCE
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".bz2", ".xz"])
+def test_compressed_output(tmp_path, suffix):
+    """Test that output is compressed by extension and is deterministic."""
+    src = tmp_path / "doc.md"
+    src.write_text(SOURCE)
+    out = tmp_path / ("doc.tex" + suffix)
+
+    assert process_file(str(src), str(out)) == "written"
+    assert detect_compression(str(out)) is not None
+    with open_text_reader(str(out)) as f:
+        assert "\\section{Title}" in f.read()
+    assert process_file(str(src), str(out)) == "unchanged"
+
+
+@pytest.mark.skipif(
+    streams._zstd is None and streams._zstandard is None,
+    reason="zstd support not available",
+)
+def test_zstd_roundtrip(tmp_path):
+    """Test zstd input and output when a zstd implementation is installed."""
+    src = tmp_path / "doc.md"
+    src.write_text(SOURCE)
+    out = tmp_path / "doc.tex.zst"
+    process_file(str(src), str(out))
+
+    assert detect_compression(str(out)) == "zstd"
+    with open_text_reader(str(out)) as f:
+        assert "\\section{Title}" in f.read()
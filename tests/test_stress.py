@@ -0,0 +1,162 @@
+# Adversarial inputs: each must parse in linear time
+import os
+import time
+
+import pytest
+
+from texweaver import (
+    Converter,
+    DefaultConfig,
+    IncludeResolver,
+    ParseLimitError,
+    ParserLimits,
+    TexParser,
+)
+
+SIZE = 200_000
+
+ADVERSARIAL_LINES = {
+    "unterminated_comments": "a <!--" * (SIZE // 6),
+    "comment_pairs": "<!-- x -->y" * (SIZE // 11),
+    "list_item_digits": "- " + "1" * SIZE,
+    "unmatched_stars": "*a" * (SIZE // 2) + "$" + "b" * SIZE,
+    "unmatched_backticks": "`" + "a`$" * (SIZE // 3),
+    "broken_bold": "**a*" * (SIZE // 4),
+    "delimiters_only": "*`$" * (SIZE // 3),
+    "heading_without_space": "#" * SIZE,
+    "unclosed_image": "![" + "a" * SIZE,
+}
+
+
+@pytest.mark.parametrize("name", sorted(ADVERSARIAL_LINES))
+def test_adversarial_line_parses_quickly(name):
+    """Test that pathological lines do not trigger slow paths."""
+    line = ADVERSARIAL_LINES[name]
+    start = time.perf_counter()
+    parser = TexParser()
+    parser.parse(line)
+    parser.doc.to_latex(DefaultConfig)
+    assert time.perf_counter() - start < 2.0
+
+
+def test_many_short_lines_parse_quickly():
+    """Test that a large document of mixed lines parses quickly."""
+    text = "\n".join(["# H", "*a* **b** `c` $d$ <!-- e -->", "- f", "1. g"] * 20_000)
+    start = time.perf_counter()
+    TexParser().parse(text)
+    assert time.perf_counter() - start < 5.0
+
+
+def test_comments_are_stripped_individually():
+    """Test that text between two comments is kept."""
+    parser = TexParser()
+    parser.parse("a <!-- x --> b <!-- y --> c")
+    assert parser.doc.to_latex(DefaultConfig).count("a  b  c") == 1
+
+
+def test_max_line_length():
+    """Test that overlong lines are rejected with the line number."""
+    parser = TexParser(limits=ParserLimits(max_line_length=10))
+    with pytest.raises(ParseLimitError, match="line 2"):
+        parser.parse("short\n" + "x" * 11)
+
+
+def test_max_nodes():
+    """Test that the node limit is enforced."""
+    parser = TexParser(limits=ParserLimits(max_nodes=50))
+    with pytest.raises(ParseLimitError):
+        parser.parse("*a* " * 100)
+
+
+def test_max_nesting(tmp_path):
+    """Test that deeply nested includes are rejected."""
+    for i in range(5):
+        (tmp_path / f"{i}.md").write_text(f"!include {i + 1}.md\n")
+    (tmp_path / "5.md").write_text("leaf\n")
+
+    resolver = IncludeResolver(
+        limits=ParserLimits(max_nesting=3, include_root=str(tmp_path))
+    )
+    with pytest.raises(ParseLimitError, match="nested"):
+        resolver.load(str(tmp_path / "0.md"))
+
+
+def test_includes_refused_with_limits(tmp_path):
+    """Test that explicit limits refuse includes unless they are allowed."""
+    secret = tmp_path / "secret.txt"
+    secret.write_text("secret\n")
+    parser = TexParser(limits=ParserLimits())
+    with pytest.raises(ParseLimitError, match="line 2: include"):
+        parser.parse(f"text\n!include {secret}\n")
+
+    parser = TexParser(limits=ParserLimits(allow_includes=True))
+    parser.parse(f"!include {secret}\n")
+    assert "secret" in parser.doc.to_latex(DefaultConfig)
+
+
+def test_include_root(tmp_path):
+    """Test that includes are confined to the include root."""
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "part.md").write_text("Part\n")
+    (tmp_path / "outside.md").write_text("Outside\n")
+    os.symlink(tmp_path / "outside.md", tmp_path / "docs" / "link.md")
+    limits = ParserLimits(include_root=str(tmp_path / "docs"))
+
+    parser = TexParser(limits=limits, base_dir=str(tmp_path / "docs"))
+    parser.parse("!include part.md\n")
+    for path in ("../outside.md", "link.md", str(tmp_path / "outside.md")):
+        parser = TexParser(limits=limits, base_dir=str(tmp_path / "docs"))
+        with pytest.raises(ParseLimitError, match="outside"):
+            parser.parse(f"!include {path}\n")
+
+
+def test_include_root_with_shared_resolver(tmp_path):
+    """Test that nested includes are confined when the resolver is shared."""
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "book.md").write_text("!include part.md\n")
+    (docs / "part.md").write_text("!include ../secret.md\n")
+    (tmp_path / "secret.md").write_text("Secret\n")
+    resolver = IncludeResolver()
+    # A trusted parse caches part.md with its escaping include
+    Converter(resolver=resolver).parse_file(str(docs / "book.md"))
+
+    converter = Converter(
+        limits=ParserLimits(include_root=str(docs)), resolver=resolver
+    )
+    with pytest.raises(ParseLimitError, match="outside"):
+        converter.parse_file(str(docs / "book.md"))
+    resolver.invalidate()
+    with pytest.raises(ParseLimitError, match="outside"):
+        converter.parse_file(str(docs / "book.md"))
+
+
+def test_overlong_line_is_not_read_whole(tmp_path):
+    """Test that reading a file stops at the first overlong line."""
+    path = tmp_path / "big.md"
+    path.write_text("short\n" + "x" * 1_000_000)
+    converter = Converter(limits=ParserLimits(max_line_length=1000))
+    with pytest.raises(ParseLimitError, match="line 2"):
+        converter.parse_file(str(path))
+
+    if os.path.exists("/dev/zero"):
+        resolver = IncludeResolver(limits=ParserLimits(max_line_length=1000))
+        with pytest.raises(ParseLimitError, match="line 1"):
+            resolver.load("/dev/zero")
+
+
+def test_max_nodes_counts_include_tree(tmp_path):
+    """Test that the node limit applies to all included documents together."""
+    (tmp_path / "part.md").write_text("*a* " * 20 + "\n")
+    (tmp_path / "book.md").write_text("!include part.md\n" * 5)
+    limits = ParserLimits(max_nodes=150, include_root=str(tmp_path))
+    resolver = IncludeResolver(limits=limits)
+
+    # Each part has about 42 nodes: within the limit alone, not five times
+    resolver.load(str(tmp_path / "part.md"))
+    with pytest.raises(ParseLimitError, match="more than 150 nodes"):
+        resolver.load(str(tmp_path / "book.md"))
+    with pytest.raises(ParseLimitError, match="more than 150 nodes"):
+        Converter(limits=limits, resolver=resolver).parse_file(
+            str(tmp_path / "book.md")
+        )
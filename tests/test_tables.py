@@ -0,0 +1,59 @@
+import io
+import time
+
+from texweaver import DefaultConfig, LatexRenderer, TexConfig, TexParser
+from texweaver import markdown as xwm
+
+
+def test_table_basic():
+    """Test parsing and rendering of a pipe table."""
+    parser = TexParser()
+    parser.parse(
+        "| Name | Value |\n| :--- | ---: |\n| a_b | **1** |\n| c |\nTable: Results\n"
+    )
+    table = parser.doc.components[0]
+
+    assert isinstance(table, xwm.Table)
+    assert table.alignment == "lr"
+    assert table.rows[0][0] == "a\\_b"
+    assert isinstance(table.rows[0][1], xwm.Content)
+    assert table.rows[1] == ("c", "")
+
+    latex = parser.doc.to_latex(DefaultConfig)
+    assert "\\begin{tabular}{lr}" in latex
+    assert "\\textbf{Name} & \\textbf{Value} \\\\ \\hline" in latex
+    assert "a\\_b & \\textbf{1} \\\\" in latex
+    assert "\\caption{Results}" in latex
+
+
+def test_pipe_line_without_delimiter_row_is_paragraph():
+    """Test that a lone pipe line is not treated as a table."""
+    parser = TexParser()
+    parser.parse("| just text\nmore")
+    assert [type(c) for c in parser.doc.components] == [xwm.Paragraph]
+    assert parser.doc.components[0].content.plain_text() == "| just text\nmore"
+
+
+def test_large_table_streams_as_longtable():
+    """Test that large tables use longtable and render quickly."""
+    rows = "".join(f"| r{i} | {i} |\n" for i in range(100_000))
+    start = time.perf_counter()
+    parser = TexParser()
+    parser.parse("| a | b |\n|---|---|\n" + rows)
+    out = io.StringIO()
+    LatexRenderer(DefaultConfig).write_document(parser.doc, out)
+    assert time.perf_counter() - start < 10.0
+
+    latex = out.getvalue()
+    assert "\\begin{longtable}{ll}" in latex
+    assert "\\endhead" in latex
+    assert "r99999 & 99999 \\\\" in latex
+
+
+def test_longtable_needs_template_support():
+    """Test that templates without longtable keys keep using tabular."""
+    parser = TexParser()
+    parser.parse("| a |\n|---|\n" + "| x |\n" * 100)
+    latex = parser.doc.to_latex(TexConfig("presentation"))
+    assert "longtable" not in latex
+    assert "\\begin{tabular}{l}" in latex
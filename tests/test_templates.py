@@ -0,0 +1,86 @@
+import pytest
+
+from texweaver import Converter, TemplateError, TexConfig, tex_config
+
+
+@pytest.fixture(autouse=True)
+def count_parses(monkeypatch):
+    """Count YAML parses, starting from an empty template cache."""
+    tex_config.clear_template_cache()
+    calls = []
+    safe_load = tex_config.yaml.safe_load
+
+    def counting_safe_load(stream):
+        calls.append(stream.name)
+        return safe_load(stream)
+
+    monkeypatch.setattr(tex_config.yaml, "safe_load", counting_safe_load)
+    yield calls
+    tex_config.clear_template_cache()
+
+
+def test_extends_builtin_template(tmp_path):
+    """Test that a template only needs the rules it overrides."""
+    path = tmp_path / "custom.yaml"
+    path.write_text(
+        'extends: default\nname: "Custom"\n'
+        'formatting:\n  bold: "\\\\emph{{{content}}}"\n  italic: null\n'
+    )
+    config = TexConfig(config_file=str(path))
+
+    assert "extends" not in config.config
+    assert config.get_template_info()["name"] == "Custom"
+    assert config.get_template_info()["author"] == "TexWeaver"
+    assert "italic" not in config.config["formatting"]
+    assert "preamble" in config.config["document"]
+    latex = Converter(config).convert("Some **bold** text")
+    assert "\\emph{bold}" in latex
+    assert "\\documentclass{article}" in latex
+
+
+def test_extends_chain_of_files(tmp_path):
+    """Test that files can extend files, relative to the extending file."""
+    (tmp_path / "base").mkdir()
+    (tmp_path / "base" / "base.yaml").write_text(
+        'extends: presentation\ncode:\n  inline_code: "CODE({content})"\n'
+    )
+    (tmp_path / "talk.yaml").write_text(
+        'extends: base/base.yaml\nformatting:\n  bold: "BOLD({content})"\n'
+    )
+    config = TexConfig(config_file=str(tmp_path / "talk.yaml"))
+
+    assert config.apply("code", "inline_code", content="x") == "CODE(x)"
+    assert config.apply_simple("bold", content="x") == "BOLD(x)"
+    assert config.config["slide"] == TexConfig("presentation").config["slide"]
+
+
+def test_merged_config_is_cached(tmp_path, count_parses):
+    """Test that the chain is only re-read when one of its files changes."""
+    base = tmp_path / "base.yaml"
+    base.write_text('extends: default\nformatting:\n  bold: "A({content})"\n')
+    (tmp_path / "doc.yaml").write_text("extends: base.yaml\n")
+    path = str(tmp_path / "doc.yaml")
+
+    first = TexConfig(config_file=path)
+    assert len(count_parses) == 3
+    first.config["formatting"]["bold"] = "changed"
+    second = TexConfig(config_file=path)
+    assert len(count_parses) == 3
+    assert second.apply_simple("bold", content="x") == "A(x)"
+
+    base.write_text('extends: default\nformatting:\n  bold: "BB({content})"\n')
+    third = TexConfig(config_file=path)
+    assert count_parses[3:] == [str(base)]
+    assert third.apply_simple("bold", content="x") == "BB(x)"
+
+
+def test_extends_errors(tmp_path):
+    """Test that cycles and unknown bases are reported."""
+    (tmp_path / "a.yaml").write_text("extends: b.yaml\n")
+    (tmp_path / "b.yaml").write_text("extends: a.yaml\n")
+    with pytest.raises(TemplateError, match="cycle"):
+        TexConfig(config_file=str(tmp_path / "a.yaml"))
+
+    (tmp_path / "c.yaml").write_text("extends: no-such-template\n")
+    with pytest.raises(TemplateError, match="no-such-template"):
+        TexConfig(config_file=str(tmp_path / "c.yaml"))
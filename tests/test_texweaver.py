@@ -63,6 +63,15 @@ def test_texweaver_with_file():
         pytest.skip("No test markdown file found")
 
 
+def test_package_exports_only_public_names():
+    """Test that the package does not re-export the modules' own imports."""
+    import texweaver
+
+    for name in ("os", "re", "yaml", "Dict", "Optional", "xwm", "mypyc_attr"):
+        assert not hasattr(texweaver, name)
+    assert texweaver.SourceMap and texweaver.ParserLimits and texweaver.TexParser
+
+
 if __name__ == "__main__":
     test_texweaver_basic()
     test_texweaver_with_file()